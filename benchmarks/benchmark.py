@@ -0,0 +1,409 @@
+'''Benchmarks of the hot paths of trkrutils on synthetic datasets.
+
+Run from the root of the repository, e.g.:
+
+    python benchmarks/benchmark.py --length 300 --videos 4 --output bench.json
+
+No dataset is downloaded: OTB- and VOT-layout sequences are generated in a
+temporary folder and tracked by dummy trackers. The results are printed as a
+table and optionally written as JSON for tracking throughput over releases.
+'''
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+from timeit import default_timer as timer
+
+import cv2
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import mpld3
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from trkrutils import reporter
+from trkrutils.core import Tracker, BoundingBox, RunResult, overlap_ratios, center_distances
+from trkrutils.loader import OTBVideo, VOTVideo, PackedVideo, CachedVideo, pack_video, prefetch_frames
+from trkrutils.evaluator import _run_tracker, eval_video
+from trkrutils.eao import estimate_eao_interval
+from trkrutils.estimator import (
+    estimate_success_plot,
+    estimate_precision_plot,
+    estimate_accuracy,
+    estimate_robustness,
+    estimate_ar_plot,
+    estimate_eao,
+    estimate_speed,
+    DEFAULT_EAO_INTERVAL_THRESHOLD
+)
+
+DEFAULT_LENGTH = 200
+DEFAULT_WIDTH = 640
+DEFAULT_HEIGHT = 360
+DEFAULT_VIDEOS = 3
+DEFAULT_REPEAT = 5
+DEFAULT_EAO_SEQUENCES = 60
+DEFAULT_SEED = 0
+
+# The size of the target in the synthetic sequences, relative to the frame size
+TARGET_SCALE = 0.2
+
+class StaticTracker(Tracker):
+    '''A dummy tracker which never moves, so it fails once the target moves away'''
+
+    def init_frame(self, img, gt):
+        self.box = (gt.x1, gt.y1, gt.x2, gt.y2)
+
+    def estimate(self, img):
+        return BoundingBox(*self.box)
+
+class RandomWalkTracker(Tracker):
+    '''A dummy tracker which drifts randomly from its initialization'''
+
+    # Init function
+    def __init__(self, seed = DEFAULT_SEED, step = 2.0):
+        self.rng = np.random.RandomState(seed)
+        self.step = step
+
+    def init_frame(self, img, gt):
+        self.box = np.array([gt.x1, gt.y1, gt.x2, gt.y2], dtype = np.float64)
+
+    def estimate(self, img):
+        self.box += np.tile(self.rng.randn(2) * self.step, 2)
+        return BoundingBox(*[int(x) for x in self.box])
+
+# Generate the bounding boxes (x, y, box_width, box_height) of a target doing a random walk in the frame
+def _gen_boxes(length, width, height, rng):
+    box_width = max(int(width * TARGET_SCALE), 2)
+    box_height = max(int(height * TARGET_SCALE), 2)
+    steps = rng.randn(length, 2) * 3.0
+    steps[0] = [(width - box_width) / 2.0, (height - box_height) / 2.0]
+    positions = np.cumsum(steps, axis = 0)
+    positions[:, 0] = np.clip(positions[:, 0], 1, width - box_width - 1)
+    positions[:, 1] = np.clip(positions[:, 1], 1, height - box_height - 1)
+    return [(int(x), int(y), box_width, box_height) for x, y in positions]
+
+# Generate a sequence in the layout of OTB (img/0001.jpg, groundtruth_rect.txt) or VOT (00000001.jpg, groundtruth.txt)
+def _gen_video(path, layout, length, width, height, rng):
+    img_path = os.path.join(path, 'img') if layout == 'otb' else path
+    os.makedirs(img_path)
+
+    # A smooth background with some noise, so the images are decoded at a realistic cost
+    background = np.zeros((height, width, 3), dtype = np.uint8)
+    background[:, :, 0] = np.linspace(0, 255, width, dtype = np.uint8)[np.newaxis, :]
+    background[:, :, 1] = np.linspace(0, 255, height, dtype = np.uint8)[:, np.newaxis]
+
+    lines = []
+    for idx, (x, y, w, h) in enumerate(_gen_boxes(length, width, height, rng)):
+        img = background + rng.randint(0, 16, size = background.shape).astype(np.uint8)
+        cv2.rectangle(img, (x, y), (x + w, y + h), (0, 0, 255), -1)
+        if layout == 'otb':
+            filename = os.path.join(img_path, '{:04d}.jpg'.format(idx + 1))
+            lines.append('{},{},{},{}'.format(x, y, w, h))
+        else:
+            # The polygon is 1-based in VOT
+            filename = os.path.join(img_path, '{:08d}.jpg'.format(idx + 1))
+            polygon = [x + 1, y + 1, x + w + 1, y + 1, x + w + 1, y + h + 1, x + 1, y + h + 1]
+            lines.append(','.join('{:.2f}'.format(v) for v in polygon))
+        cv2.imwrite(filename, img)
+
+    with open(os.path.join(path, OTBVideo.GT_NAME if layout == 'otb' else VOTVideo.GT_NAME), 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+# Generate synthetic datasets with videos of different lengths (around the given length)
+def gen_datasets(root_path, length, width, height, videos, seed = DEFAULT_SEED):
+    rng = np.random.RandomState(seed)
+    lengths = [max(int(length * (0.5 + float(i) / max(videos - 1, 1))), 2) for i in range(videos)]
+    datasets = dict()
+
+    for layout, video_class in [('otb', OTBVideo), ('vot', VOTVideo)]:
+        dataset_videos = []
+        for idx, video_length in enumerate(lengths):
+            name = '{}{:02d}'.format(layout.upper(), idx)
+            path = os.path.join(root_path, layout, name)
+            _gen_video(path, layout, video_length, width, height, rng)
+            dataset_videos.append(video_class(layout, name, path))
+        datasets[layout] = dataset_videos
+
+    return datasets
+
+class Benchmark:
+    # Init function, items is the number of items (e.g., frames) processed in one call of func
+    def __init__(self, name, func, items = 1, unit = 'call', setup = None):
+        self.name = name
+        self.func = func
+        self.items = items
+        self.unit = unit
+        self.setup = setup
+
+    # Time the function for given repetitions, setup (if any) is called before each repetition without timing
+    def run(self, repeat):
+        times = []
+        for i in range(repeat):
+            if self.setup is not None:
+                self.setup()
+            start = timer()
+            self.func()
+            times.append(timer() - start)
+
+        median = float(np.median(times))
+        return {
+            'name': self.name,
+            'unit': self.unit,
+            'items': self.items,
+            'repeat': repeat,
+            'times': times,
+            'min': float(np.min(times)),
+            'median': median,
+            'mean': float(np.mean(times)),
+            'throughput': self.items / median if median > 0 else float('nan')
+        }
+
+# Consume all frames of a video, the images are touched so lazy sources are really read
+def _consume(frames):
+    count = 0
+    for frame in frames:
+        count += frame.get_img(with_gt = False).shape[0] > 0
+    return count
+
+# Drop the parsed ground truth, so it is loaded again from the cache file or the text file
+def _reset_groundtruth(videos):
+    def reset():
+        for video in videos:
+            video.groundtruth = None
+    return reset
+
+def _loader_benchmarks(datasets, pack_path):
+    benchmarks = []
+
+    for layout, videos in sorted(datasets.items()):
+        frames = sum(video.length() for video in videos)
+        benchmarks.append(Benchmark(
+            'loader.{}.parse_groundtruth'.format(layout),
+            lambda videos = videos: [video.parse_groundtruth() for video in videos],
+            len(videos), 'video'))
+        benchmarks.append(Benchmark(
+            'loader.{}.load_groundtruth'.format(layout),
+            lambda videos = videos: [video.load_groundtruth() for video in videos],
+            len(videos), 'video', setup = _reset_groundtruth(videos)))
+        benchmarks.append(Benchmark(
+            'loader.{}.iter_frames'.format(layout),
+            lambda videos = videos: [_consume(video.iter_frames()) for video in videos],
+            frames, 'frame'))
+        benchmarks.append(Benchmark(
+            'loader.{}.prefetch_frames'.format(layout),
+            lambda videos = videos: [_consume(prefetch_frames(video)) for video in videos],
+            frames, 'frame'))
+
+    # Frames served from packed files (memory-mapped raw pixels)
+    packed_videos = []
+    for video in datasets['otb']:
+        path = os.path.join(pack_path, '{}.pack'.format(video.name))
+        pack_video(video, path)
+        packed_videos.append(PackedVideo(path))
+    frames = sum(video.length() for video in packed_videos)
+    benchmarks.append(Benchmark(
+        'loader.packed.iter_frames',
+        lambda: [_consume(video.iter_frames()) for video in packed_videos],
+        frames, 'frame'))
+
+    return benchmarks
+
+def _run_tracker_benchmarks(datasets):
+    # The frames are decoded once, so the benchmarks measure the overhead of tracking and scoring
+    videos = [CachedVideo(video) for video in datasets['otb'] + datasets['vot']]
+    for video in videos:
+        _consume(video.iter_frames())
+    frames = sum(video.length() for video in videos)
+
+    benchmarks = []
+    for tracker_class in [StaticTracker, RandomWalkTracker]:
+        for reset in [False, True]:
+            benchmarks.append(Benchmark(
+                'run_tracker.{}.{}'.format(tracker_class.__name__, 'reset' if reset else 'no_reset'),
+                lambda tracker_class = tracker_class, reset = reset: [
+                    _run_tracker(tracker_class(), video, reset = reset, prefetch = 0) for video in videos
+                ],
+                frames, 'frame'))
+
+    return benchmarks
+
+def _core_benchmarks(datasets, repetitions):
+    benchmarks = []
+
+    # The ground truth of OTB is bounding boxes, while the one of VOT is polygons
+    for layout, videos in sorted(datasets.items()):
+        runs = []
+        for video in videos:
+            video = CachedVideo(video)
+            gt_regions = video.load_gt_regions()
+            runs.extend([(_run_tracker(RandomWalkTracker(i), video, reset = False, prefetch = 0), gt_regions) for i in range(repetitions)])
+        frames = sum(run_result.length() for run_result, gt_regions in runs)
+
+        # All estimated bounding boxes and ground truth regions in one array
+        boxes = np.concatenate([run_result.boxes for run_result, gt_regions in runs])
+        gt_regions = np.concatenate([gt_regions for run_result, gt_regions in runs])
+
+        benchmarks.extend([
+            Benchmark('core.{}.overlap_ratios'.format(layout), lambda gt_regions = gt_regions, boxes = boxes: overlap_ratios(gt_regions, boxes), frames, 'frame'),
+            Benchmark('core.{}.center_distances'.format(layout), lambda gt_regions = gt_regions, boxes = boxes: center_distances(gt_regions, boxes), frames, 'frame'),
+            Benchmark('core.{}.rescore'.format(layout), lambda runs = runs: [run_result.rescore(gt_regions) for run_result, gt_regions in runs], frames, 'frame')
+        ])
+
+    return benchmarks
+
+def _estimator_benchmarks(datasets, repetitions):
+    videos = [CachedVideo(video) for video in datasets['otb'] + datasets['vot']]
+    sequence_lengths = [video.length() for video in videos]
+    frames = sum(sequence_lengths) * repetitions
+
+    # The results of each video and repetition, for the experiments without and with reset
+    no_reset_results = []
+    reset_results = []
+    for video in videos:
+        no_reset_results.append([_run_tracker(RandomWalkTracker(i), video, reset = False, prefetch = 0) for i in range(repetitions)])
+        reset_results.append([_run_tracker(RandomWalkTracker(i), video, reset = True, prefetch = 0) for i in range(repetitions)])
+
+    # The dataset-level results are concatenated over videos for each repetition
+    no_reset_dataset_results = [RunResult.concatenate([r[i] for r in no_reset_results]) for i in range(repetitions)]
+    reset_dataset_results = [RunResult.concatenate([r[i] for r in reset_results]) for i in range(repetitions)]
+
+    return [
+        Benchmark('estimator.success_plot', lambda: estimate_success_plot(no_reset_dataset_results), frames, 'frame'),
+        Benchmark('estimator.precision_plot', lambda: estimate_precision_plot(no_reset_dataset_results), frames, 'frame'),
+        Benchmark('estimator.accuracy', lambda: estimate_accuracy(reset_dataset_results), frames, 'frame'),
+        Benchmark('estimator.robustness', lambda: estimate_robustness(reset_dataset_results), frames, 'frame'),
+        Benchmark('estimator.ar_plot', lambda: estimate_ar_plot(reset_dataset_results), frames, 'frame'),
+        Benchmark('estimator.eao', lambda: estimate_eao(reset_results, sequence_lengths), frames, 'frame'),
+        Benchmark('estimator.speed', lambda: estimate_speed(no_reset_dataset_results), frames, 'frame')
+    ]
+
+def _eao_benchmarks(length, eao_sequences, seed = DEFAULT_SEED):
+    # The lengths of sequences are spread like a real dataset
+    rng = np.random.RandomState(seed)
+    sequence_lengths = [int(x) for x in rng.randint(max(length // 4, 2), length * 4, size = eao_sequences)]
+
+    return [
+        Benchmark(
+            'eao.estimate_eao_interval',
+            lambda: estimate_eao_interval(sequence_lengths, DEFAULT_EAO_INTERVAL_THRESHOLD),
+            eao_sequences, 'sequence')
+    ]
+
+def _report_benchmarks(datasets):
+    video = CachedVideo(datasets['vot'][0])
+    _consume(video.iter_frames())
+    score = eval_video([StaticTracker(), RandomWalkTracker()], video, prefetch = 0)[0]
+
+    plotters = [
+        ('success_plot', reporter._success_plot),
+        ('precision_plot', reporter._precision_plot),
+        ('ar_plot', reporter._ar_plot),
+        ('eao', reporter._eao),
+        ('speed', reporter._speed)
+    ]
+
+    # Generate the figure and table of a metric and convert the figure to HTML as report does
+    def plot(plotter):
+        fig, table, filename = plotter(score)
+        mpld3.fig_to_html(fig)
+        plt.close(fig)
+
+    return [
+        Benchmark('report.{}'.format(metric), lambda plotter = plotter: plot(plotter), 1, 'figure')
+        for metric, plotter in plotters
+    ]
+
+# Make the result of a failed benchmark
+def _failure(name, error):
+    return {
+        'name': name,
+        'error': '{}: {}'.format(error.__class__.__name__, error)
+    }
+
+def _print_results(results):
+    print('{:<45} {:>12} {:>12} {:>16}'.format('benchmark', 'min (ms)', 'median (ms)', 'throughput'))
+    for result in results:
+        if 'error' in result:
+            print('{:<45} FAILED {}'.format(result['name'], result['error']))
+            continue
+        print('{:<45} {:>12.3f} {:>12.3f} {:>16}'.format(
+            result['name'],
+            result['min'] * 1000.0,
+            result['median'] * 1000.0,
+            '{:.1f} {}/s'.format(result['throughput'], result['unit'])))
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Benchmark trkrutils on synthetic datasets')
+    parser.add_argument('--length', type = int, default = DEFAULT_LENGTH, help = 'average number of frames of a video')
+    parser.add_argument('--width', type = int, default = DEFAULT_WIDTH, help = 'width of frames')
+    parser.add_argument('--height', type = int, default = DEFAULT_HEIGHT, help = 'height of frames')
+    parser.add_argument('--videos', type = int, default = DEFAULT_VIDEOS, help = 'number of videos of each dataset')
+    parser.add_argument('--repeat', type = int, default = DEFAULT_REPEAT, help = 'number of timed repetitions of a benchmark')
+    parser.add_argument('--repetitions', type = int, default = 3, help = 'number of runs of a tracker on a video for the estimators')
+    parser.add_argument('--eao-sequences', type = int, default = DEFAULT_EAO_SEQUENCES, help = 'number of sequence lengths for the EAO interval')
+    parser.add_argument('--filter', default = '', help = 'only run benchmarks whose names start with the string, e.g. "loader." or "estimator.eao"')
+    parser.add_argument('--output', default = None, help = 'write the results as JSON to the file')
+    parser.add_argument('--seed', type = int, default = DEFAULT_SEED, help = 'random seed of the synthetic datasets')
+    args = parser.parse_args(argv)
+
+    root_path = tempfile.mkdtemp(prefix = 'trkrutils-bench-')
+    try:
+        datasets = gen_datasets(root_path, args.length, args.width, args.height, args.videos, args.seed)
+        pack_path = os.path.join(root_path, 'packed')
+        os.makedirs(pack_path)
+
+        # Each group is only prepared when one of its benchmarks is selected
+        groups = [
+            ('loader.', lambda: _loader_benchmarks(datasets, pack_path)),
+            ('run_tracker.', lambda: _run_tracker_benchmarks(datasets)),
+            ('core.', lambda: _core_benchmarks(datasets, args.repetitions)),
+            ('estimator.', lambda: _estimator_benchmarks(datasets, args.repetitions)),
+            ('eao.', lambda: _eao_benchmarks(args.length, args.eao_sequences, args.seed)),
+            ('report.', lambda: _report_benchmarks(datasets))
+        ]
+
+        # A failing benchmark (or group) is recorded with its error, so the others still run
+        results = []
+        for prefix, make_benchmarks in groups:
+            if not (prefix.startswith(args.filter) or args.filter.startswith(prefix)):
+                continue
+            try:
+                benchmarks = make_benchmarks()
+            except Exception as e:
+                results.append(_failure(prefix + '*', e))
+                continue
+            for benchmark in benchmarks:
+                if benchmark.name.startswith(args.filter):
+                    try:
+                        results.append(benchmark.run(args.repeat))
+                    except Exception as e:
+                        results.append(_failure(benchmark.name, e))
+    finally:
+        shutil.rmtree(root_path, ignore_errors = True)
+
+    _print_results(results)
+
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'timestamp': time.time(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'numpy': np.__version__,
+                'opencv': cv2.__version__,
+                'params': vars(args),
+                'results': results
+            }, f, indent = 2, sort_keys = True)
+
+    if any('error' in result for result in results):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,4 @@
+import sys
+
+# The async evaluator requires Python 3.7+
+collect_ignore = [] if sys.version_info >= (3, 7) else ['test_async_evaluator.py']
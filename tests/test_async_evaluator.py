@@ -0,0 +1,170 @@
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import cv2
+import numpy as np
+from trkrutils import evaluator, async_evaluator
+from trkrutils.core import Tracker, BoundingBox, Dataset
+from trkrutils.loader import OTBVideo
+
+IMG_SIZE = 64
+BOX_SIZE = 16
+
+# Write a synthetic OTB video, the target moves right by one pixel per frame
+def _write_video(path, start, video_length):
+    os.makedirs(os.path.join(path, 'img'))
+    lines = []
+    for idx in range(video_length):
+        cv2.imwrite(os.path.join(path, 'img', '{:04d}.jpg'.format(idx + 1)), np.zeros((IMG_SIZE, IMG_SIZE, 3), dtype = np.uint8))
+        lines.append('{},{},{},{}\n'.format(start + idx, start, BOX_SIZE, BOX_SIZE))
+    with open(os.path.join(path, OTBVideo.GT_NAME), 'w') as f:
+        f.writelines(lines)
+
+# A deterministic tracker which drifts away from the initialized box, so it fails and is re-initialized
+class _DriftModel:
+    def __init__(self):
+        self.box = None
+
+    def init_frame(self, gt):
+        self.box = list(gt)
+
+    def estimate(self):
+        self.box = [self.box[0] + 3, self.box[1] + 1, self.box[2] + 3, self.box[3] + 1]
+        return BoundingBox(*self.box)
+
+class Drift(Tracker):
+    def __init__(self):
+        self.model = _DriftModel()
+
+    def init_frame(self, img, gt):
+        self.model.init_frame([gt.x1, gt.y1, gt.x2, gt.y2])
+
+    def estimate(self, img):
+        return self.model.estimate()
+
+# A stub tracker server, each connection is a session of a drift tracker with JSON lines as messages
+async def _serve_drift(reader, writer):
+    model = _DriftModel()
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        request = json.loads(line.decode('utf-8'))
+        # The latency of a remote tracker
+        await asyncio.sleep(0.001)
+        if request['op'] == 'init':
+            model.init_frame(request['gt'])
+            response = dict()
+        else:
+            region = model.estimate()
+            response = {'box': [region.x1, region.y1, region.x2, region.y2]}
+        writer.write((json.dumps(response) + '\n').encode('utf-8'))
+        await writer.drain()
+    writer.close()
+
+# The client of the stub tracker server
+class RemoteDrift(async_evaluator.AsyncTracker):
+    port = None
+    # The number of calls after which the first tracker fails, and the events of all trackers for checking
+    fail_after = None
+    events = []
+    count = 0
+
+    def __init__(self):
+        self.idx = RemoteDrift.count
+        RemoteDrift.count += 1
+        self.connection = None
+        self.calls = 0
+        self.busy = False
+
+    async def call(self, request):
+        self.busy = True
+        try:
+            if self.connection is None:
+                self.connection = await asyncio.open_connection('127.0.0.1', RemoteDrift.port)
+            self.calls += 1
+            if self.idx == 0 and RemoteDrift.fail_after is not None and self.calls > RemoteDrift.fail_after:
+                raise RuntimeError('Tracker server is down')
+            reader, writer = self.connection
+            writer.write((json.dumps(request) + '\n').encode('utf-8'))
+            await writer.drain()
+            return json.loads((await reader.readline()).decode('utf-8'))
+        finally:
+            self.busy = False
+
+    async def init_frame(self, img, gt):
+        await self.call({'op': 'init', 'gt': [gt.x1, gt.y1, gt.x2, gt.y2]})
+
+    async def estimate(self, img):
+        return BoundingBox(*(await self.call({'op': 'estimate'}))['box'])
+
+    async def close(self):
+        RemoteDrift.events.append(('close', self.busy))
+        if self.connection is not None:
+            self.connection[1].close()
+
+RemoteDrift.__name__ = 'Drift'
+
+class AsyncEvaluatorTest(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        videos = []
+        # The videos have different lengths for estimating the EAO interval
+        for idx, name in enumerate(['A', 'B', 'C', 'D']):
+            _write_video(os.path.join(self.path, name), 4 + idx * 2, 20 + idx * 7)
+            videos.append(OTBVideo('otb', name, os.path.join(self.path, name)))
+        self.dataset = Dataset('otb', self.path, videos)
+        RemoteDrift.fail_after = None
+        RemoteDrift.events = []
+        RemoteDrift.count = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    # Evaluate the remote trackers against a stub server on a local port
+    def eval_remote(self, **kwargs):
+        async def run():
+            server = await asyncio.start_server(_serve_drift, '127.0.0.1', 0)
+            RemoteDrift.port = server.sockets[0].getsockname()[1]
+            try:
+                return await async_evaluator.eval_dataset_async([RemoteDrift], self.dataset, **kwargs)
+            finally:
+                server.close()
+                await server.wait_closed()
+        return asyncio.run(run())
+
+    def assert_same_scores(self, scores0, scores1):
+        self.assertEqual([s.target_name for s in scores0], [s.target_name for s in scores1])
+        for score0, score1 in zip(scores0, scores1):
+            for metric in evaluator.METRICS:
+                if metric == 'speed':
+                    continue
+                value0 = score0.get_val('Drift', metric)
+                value1 = score1.get_val('Drift', metric)
+                for key in ['auc', 'precision_score', 'accuracy', 'reliability', 'eao_measure']:
+                    if key in value0:
+                        self.assertAlmostEqual(value0[key], value1[key])
+
+    def test_same_scores_as_sync(self):
+        expected = evaluator.eval([Drift()], self.dataset)
+        self.assert_same_scores(expected, self.eval_remote(concurrency = 1))
+        self.assert_same_scores(expected, self.eval_remote(concurrency = 8, video_concurrency = 2))
+        self.assertTrue(all(not busy for _, busy in RemoteDrift.events))
+
+    def test_compact_scores(self):
+        scores = self.eval_remote(compact = True)
+        self.assertNotIn('run_results', scores[1].get_val('Drift', 'success_plot'))
+
+    def test_failure_cancels_runs(self):
+        RemoteDrift.fail_after = 5
+        with self.assertRaises(RuntimeError):
+            self.eval_remote(video_concurrency = 3)
+        # Every tracker is closed once, after its run is stopped
+        self.assertEqual(len(RemoteDrift.events), RemoteDrift.count)
+        self.assertTrue(all(not busy for _, busy in RemoteDrift.events))
+
+if __name__ == '__main__':
+    unittest.main()
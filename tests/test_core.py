@@ -0,0 +1,22 @@
+import unittest
+import numpy as np
+from trkrutils.core import overlap_ratios, center_distances
+
+BOX = [0.0, 0.0, 2.0, 2.0]
+POLYGON = [1.0, 1.0, 3.0, 1.0, 3.0, 3.0, 1.0, 3.0]
+
+class RegionArraysTest(unittest.TestCase):
+    def test_boxes_and_polygons(self):
+        self.assertAlmostEqual(overlap_ratios([BOX], [POLYGON])[0], 1.0 / 7.0)
+        self.assertAlmostEqual(overlap_ratios([POLYGON], [BOX])[0], 1.0 / 7.0)
+        self.assertAlmostEqual(center_distances([BOX], [POLYGON])[0], np.sqrt(2.0))
+
+    def test_empty_arrays(self):
+        for width0, width1 in [(4, 4), (4, 8), (8, 4), (8, 8)]:
+            regions0 = np.zeros((0, width0))
+            regions1 = np.zeros((0, width1))
+            self.assertEqual(overlap_ratios(regions0, regions1).shape, (0,))
+            self.assertEqual(center_distances(regions0, regions1).shape, (0,))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from trkrutils import downloader
+
+try:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+except ImportError:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+
+CONTENT = os.urandom(3 * 1024 * 1024 + 123)
+
+# A local HTTP server serving CONTENT with range requests
+class _Handler(BaseHTTPRequestHandler):
+    requests = []
+
+    def do_GET(self):
+        content_range = self.headers.get('Range')
+        _Handler.requests.append(content_range)
+        if content_range is None:
+            self.send_response(200)
+            body = CONTENT
+        else:
+            offset = int(content_range.split('=')[1].split('-')[0])
+            if offset >= len(CONTENT):
+                self.send_response(416)
+                self.send_header('Content-Range', 'bytes */{}'.format(len(CONTENT)))
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', 'bytes {}-{}/{}'.format(offset, len(CONTENT) - 1, len(CONTENT)))
+            body = CONTENT[offset:]
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+class DownloaderTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = HTTPServer(('127.0.0.1', 0), _Handler)
+        cls.thread = threading.Thread(target = cls.server.serve_forever)
+        cls.thread.daemon = True
+        cls.thread.start()
+        cls.url = 'http://127.0.0.1:{}/video.zip'.format(cls.server.server_address[1])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.out = os.path.join(self.path, 'video.zip')
+        self.partial = self.out + downloader.PARTIAL_FILE_SUFFIX
+        self.size = len(CONTENT)
+        self.checksum = hashlib.sha256(CONTENT).hexdigest()
+        _Handler.requests = []
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def write_partial(self, content):
+        with open(self.partial, 'wb') as f:
+            f.write(content)
+
+    def read_out(self):
+        with open(self.out, 'rb') as f:
+            return f.read()
+
+    def test_download(self):
+        downloader._download_url(self.url, self.out, False, self.size, self.checksum)
+        self.assertEqual(self.read_out(), CONTENT)
+        self.assertFalse(os.path.exists(self.partial))
+
+        # A verified file is never downloaded again
+        downloader._download_url(self.url, self.out, False, self.size, self.checksum)
+        self.assertEqual(len(_Handler.requests), 1)
+
+    def test_resume(self):
+        self.write_partial(CONTENT[:1000])
+        downloader._download_url(self.url, self.out, False, self.size, self.checksum)
+        self.assertEqual(self.read_out(), CONTENT)
+        self.assertEqual(_Handler.requests, ['bytes=1000-'])
+
+    def test_resume_without_manifest(self):
+        self.write_partial(CONTENT[:1000])
+        downloader._download_url(self.url, self.out, False)
+        self.assertEqual(self.read_out(), CONTENT)
+
+    def test_complete_partial(self):
+        # The range of a complete partial file is not satisfiable
+        self.write_partial(CONTENT)
+        downloader._download_url(self.url, self.out, False, self.size, self.checksum)
+        self.assertEqual(self.read_out(), CONTENT)
+        self.assertEqual(_Handler.requests, ['bytes={}-'.format(self.size)])
+
+    def test_corrupted_partial(self):
+        # The partial file has the right size but wrong content, so it is downloaded again from scratch
+        self.write_partial(b'\0' * self.size)
+        downloader._download_url(self.url, self.out, False, self.size, self.checksum)
+        self.assertEqual(self.read_out(), CONTENT)
+        self.assertEqual(_Handler.requests, ['bytes={}-'.format(self.size), None])
+
+    def test_oversized_partial_without_manifest(self):
+        # The size of the whole file is told by the server when the range is not satisfiable
+        self.write_partial(CONTENT + b'garbage')
+        downloader._download_url(self.url, self.out, False)
+        self.assertEqual(self.read_out(), CONTENT)
+        self.assertEqual(_Handler.requests, ['bytes={}-'.format(self.size + 7), None])
+
+    def test_checksum_mismatch(self):
+        with self.assertRaises(IOError):
+            downloader._download_url(self.url, self.out, False, self.size, '0' * 64)
+        self.assertFalse(os.path.exists(self.out))
+        self.assertFalse(os.path.exists(self.partial))
+
+    def test_make_manifest(self):
+        dataset_path = os.path.join(self.path, 'vot2013')
+        os.makedirs(dataset_path)
+        with open(os.path.join(dataset_path, 'vot2013.zip'), 'wb') as f:
+            f.write(CONTENT)
+        manifest = downloader.make_manifest('vot2013', self.path)
+        self.assertEqual(manifest, {'vot2013': {'size': self.size, 'sha256': self.checksum}})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,29 @@
+import unittest
+import numpy as np
+from trkrutils.estimator import _success_rates
+
+class SuccessRatesTest(unittest.TestCase):
+    def test_default_thresholds(self):
+        ratios = np.sort(np.array([0.0, 0.2, 0.2, 0.5, 0.8]))
+        thresholds, success_rates = _success_rates(ratios)
+        self.assertEqual(thresholds, [0.0, 0.2, 0.5, 1.0])
+        self.assertEqual(success_rates, [0.8, 0.4, 0.2, 0.0])
+
+    def test_grid_of_observed_ratios(self):
+        # A frame whose overlap ratio equals a threshold is not a success in both cases
+        ratios = np.sort(np.array([0.0, 0.2, 0.2, 0.5, 0.8]))
+        thresholds, success_rates = _success_rates(ratios)
+        grid_thresholds, grid_success_rates = _success_rates(ratios, [0.0, 0.2, 0.5, 1.0])
+        self.assertEqual(grid_thresholds, thresholds)
+        self.assertEqual(grid_success_rates, success_rates)
+        self.assertEqual(_success_rates(ratios, [0.8])[1], [0.0])
+
+    def test_no_positive_ratio(self):
+        self.assertEqual(_success_rates(np.zeros(3)), ([0.0, 1.0], [0.0, 0.0]))
+        self.assertEqual(_success_rates(np.zeros(0)), ([0.0, 1.0], [0.0, 0.0]))
+
+    def test_single_positive_ratio(self):
+        self.assertEqual(_success_rates(np.array([0.0, 1.0])), ([0.0, 1.0], [0.5, 0.0]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,10 +2,12 @@ from trkrutils import core
 from trkrutils.loader import load
 from trkrutils.evaluator import eval
 from trkrutils.reporter import report
+from trkrutils.store import ResultStore
 
 __all__ = [
     'core',
     'load',
     'eval',
-    'report'
+    'report',
+    'ResultStore'
 ]
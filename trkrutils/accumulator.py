@@ -0,0 +1,271 @@
+import math
+import numpy as np
+from trkrutils.utils import mean
+from trkrutils.core import Score, SpecialRegion
+from trkrutils.profiler import stage
+from trkrutils.estimator import (
+    _trapezoid_area,
+    _success_rates,
+    _extract_fragments,
+    _fragment_tables,
+    _expected_average_overlaps,
+    _eao_measure,
+    _tracker_times,
+    DEFAULT_SENSITIVITY,
+    DEFAULT_PRECISION_MAX_THRESHOLD,
+    DEFAULT_PRECISION_SCORE_THRESHOLD,
+    DEFAULT_EAO_INTERVAL_THRESHOLD
+)
+
+# The keys of raw per-frame data and run results in the values of metrics, which are dropped by compact_score
+RAW_VALUE_KEYS = ['per_frame_ratios', 'per_frame_distances', 'run_results', 'videos_run_results']
+
+# The bins (in seconds) of the latency histogram, the percentiles are estimated within a relative error of about 1%
+LATENCY_MIN_EXPONENT = -7
+LATENCY_MAX_EXPONENT = 3
+LATENCY_BINS_PER_DECADE = 100
+
+# Streaming accumulators of dataset-level metrics. Each accumulator is updated with the metric value of a
+# video once the video is finished, and only keeps sufficient statistics of the frames instead of the run
+# results. The result can be taken at any time and has the same format as the value of the corresponding
+# estimator, without the raw per-frame data.
+
+# Add two arrays, the shorter one is padded with zeros
+def _add_padded(array0, array1):
+    result = np.zeros(max(len(array0), len(array1)), dtype = np.result_type(array0, array1))
+    result[: len(array0)] += array0
+    result[: len(array1)] += array1
+    return result
+
+class SuccessPlotAccumulator:
+    # Init function
+    def __init__(self, thresholds = None):
+        self.thresholds = thresholds
+        # XXX:
+        # The thresholds are the distinct overlap ratios of all frames as in estimate_success_plot, so the
+        # result is exact only if the per-frame overlap ratios are kept. A histogram would bound the memory,
+        # but shift the curve and its AUC. We keep the ratios exactly instead, which is 8 bytes per frame
+        # (e.g., 8 MB for a million frames) and far less than the run results they are taken from.
+        self.per_frame_ratios = []
+
+    # Update with the value of estimate_success_plot of a video
+    def update(self, value):
+        self.per_frame_ratios.append(np.asarray(value['per_frame_ratios'], dtype = np.float64))
+
+    def result(self):
+        per_frame_ratios = np.concatenate(self.per_frame_ratios) if len(self.per_frame_ratios) > 0 else np.zeros(0)
+        thresholds, success_rates = _success_rates(np.sort(per_frame_ratios), self.thresholds)
+
+        return {
+            'thresholds': thresholds,
+            'success_rates': success_rates,
+            'auc': _trapezoid_area(thresholds, success_rates)
+        }
+
+class PrecisionPlotAccumulator:
+    # Init function
+    def __init__(
+        self,
+        max_threshold = DEFAULT_PRECISION_MAX_THRESHOLD,
+        score_threshold = DEFAULT_PRECISION_SCORE_THRESHOLD):
+        self.max_threshold = max_threshold
+        self.score_threshold = score_threshold
+        self.thresholds = list(range(max_threshold + 1))
+        # The distinct thresholds, a distance is lower than exactly the thresholds after its bin
+        self.edges = np.unique(self.thresholds + [score_threshold])
+        self.counts = np.zeros(len(self.edges) + 1, dtype = np.int64)
+        self.total_count = 0
+
+    # Update with the value of estimate_precision_plot of a video
+    def update(self, value):
+        distances = value['per_frame_distances']
+        self.counts += np.bincount(np.searchsorted(self.edges, distances, side = 'right'), minlength = len(self.counts))
+        self.total_count += len(distances)
+
+    def result(self):
+        # The ratio of frames with lower distance than each threshold
+        lower_counts = np.cumsum(self.counts)
+        total_count = float(max(self.total_count, 1))
+        precisions = [lower_counts[np.searchsorted(self.edges, x)] / total_count for x in self.thresholds]
+        precision_score = lower_counts[np.searchsorted(self.edges, self.score_threshold)] / total_count
+
+        return {
+            'thresholds': self.thresholds,
+            'precisions': precisions,
+            'precision_score': float(precision_score),
+            'max_threshold': self.max_threshold,
+            'score_threshold': self.score_threshold
+        }
+
+class ARPlotAccumulator:
+    # Init function
+    def __init__(self, sensitivity = DEFAULT_SENSITIVITY):
+        self.sensitivity = sensitivity
+        self.ratios_sum = 0.0
+        self.ratios_count = 0
+        # The number of failures in each repetition, and the number of frames of a repetition
+        self.failures = None
+        self.trajectory_len = 0
+
+    # Update with the value of estimate_ar_plot of a video
+    def update(self, value):
+        ratios = value['per_frame_ratios']
+        self.ratios_sum += float(np.sum(ratios))
+        self.ratios_count += len(ratios)
+
+        run_results = value['run_results']
+        failures = np.array([r.count(SpecialRegion.FAILURE) for r in run_results], dtype = np.int64)
+        self.failures = failures if self.failures is None else self.failures + failures
+        self.trajectory_len += run_results[0].length()
+
+    def result(self):
+        accuracy = self.ratios_sum / self.ratios_count if self.ratios_count > 0 else 0.0
+        failures = [] if self.failures is None else self.failures.tolist()
+        avg_failures_rate = mean([float(x) / max(self.trajectory_len, 1) for x in failures])
+        reliability = math.exp(-self.sensitivity * avg_failures_rate)
+
+        return {
+            'accuracy': accuracy,
+            'reliability': reliability,
+            'avg_failures_rate': avg_failures_rate,
+            'sensitivity': self.sensitivity
+        }
+
+class EAOAccumulator:
+    # Init function
+    def __init__(self, threshold = DEFAULT_EAO_INTERVAL_THRESHOLD):
+        self.threshold = threshold
+        self.fragments_length = 0
+        self.fragments_count = 0
+        self.prefix_sums = np.zeros(1)
+        self.failure_sums = np.zeros(2)
+        self.success_counts = np.zeros(2, dtype = np.int64)
+        self.sequence_lengths = []
+
+    # Update with the value of estimate_eao of a video
+    def update(self, value):
+        for run_results in value['videos_run_results']:
+            fragments_length = max(r.length() for r in run_results)
+            fragments = [fragment for r in run_results for fragment in _extract_fragments(r)]
+            prefix_sums, failure_sums, success_counts = _fragment_tables(fragments, fragments_length)
+
+            # The tables of all fragments are the sums of the tables of each video
+            self.prefix_sums = _add_padded(self.prefix_sums, prefix_sums)
+            self.failure_sums = _add_padded(self.failure_sums, failure_sums)
+            self.success_counts = _add_padded(self.success_counts, success_counts)
+            self.fragments_length = max(self.fragments_length, fragments_length)
+            self.fragments_count += len(fragments)
+        self.sequence_lengths.extend(value['sequence_lengths'])
+
+    def result(self):
+        expected_average_overlaps = _expected_average_overlaps(
+            self.prefix_sums,
+            self.failure_sums,
+            self.success_counts,
+            self.fragments_count,
+            self.fragments_length
+        )
+
+        return {
+            'expected_average_overlaps': expected_average_overlaps,
+            'eao_measure': _eao_measure(expected_average_overlaps, self.sequence_lengths, self.threshold),
+            'sequence_lengths': self.sequence_lengths
+        }
+
+class SpeedAccumulator:
+    # Init function
+    def __init__(self):
+        self.edges = np.logspace(
+            LATENCY_MIN_EXPONENT,
+            LATENCY_MAX_EXPONENT,
+            (LATENCY_MAX_EXPONENT - LATENCY_MIN_EXPONENT) * LATENCY_BINS_PER_DECADE + 1
+        )
+        self.counts = np.zeros(len(self.edges) + 1, dtype = np.int64)
+        self.estimate_time = 0.0
+        self.init_time = 0.0
+        self.init_count = 0
+
+    # Update with the value of estimate_speed of a video
+    def update(self, value):
+        init_times, estimate_times = _tracker_times(value['run_results'])
+        self.counts += np.bincount(np.searchsorted(self.edges, estimate_times, side = 'right'), minlength = len(self.counts))
+        self.estimate_time += float(np.sum(estimate_times))
+        self.init_time += float(np.sum(init_times))
+        self.init_count += len(init_times)
+
+    # Estimate the k-th (0-based) lowest latency by the geometric center of the bin containing it
+    def _latency(self, cumulative_counts, k):
+        idx = int(np.searchsorted(cumulative_counts, k, side = 'right'))
+        low = self.edges[max(idx - 1, 0)]
+        high = self.edges[min(idx, len(self.edges) - 1)]
+        return math.sqrt(low * high)
+
+    # Estimate a percentile (in milliseconds) of latencies, interpolated linearly as numpy.percentile
+    def percentile(self, q):
+        cumulative_counts = np.cumsum(self.counts)
+        total_count = int(cumulative_counts[-1])
+        if total_count == 0:
+            return float('nan')
+        rank = q / 100.0 * (total_count - 1)
+        low_rank = int(math.floor(rank))
+        high_rank = min(low_rank + 1, total_count - 1)
+        low = self._latency(cumulative_counts, low_rank)
+        high = self._latency(cumulative_counts, high_rank)
+        return float(low + (high - low) * (rank - low_rank)) * 1000.0
+
+    def result(self):
+        estimate_count = int(np.sum(self.counts))
+
+        return {
+            'fps': estimate_count / self.estimate_time if self.estimate_time > 0 else float('nan'),
+            'latency_p50': self.percentile(50),
+            'latency_p95': self.percentile(95),
+            'latency_p99': self.percentile(99),
+            'init_time': self.init_time / self.init_count * 1000.0 if self.init_count > 0 else float('nan')
+        }
+
+ACCUMULATORS = {
+    'success_plot': SuccessPlotAccumulator,
+    'precision_plot': PrecisionPlotAccumulator,
+    'ar_plot': ARPlotAccumulator,
+    'eao': EAOAccumulator,
+    'speed': SpeedAccumulator
+}
+
+class DatasetAccumulator:
+    # Init function
+    def __init__(self, dataset_name):
+        self.dataset_name = dataset_name
+        # The accumulators of each metric and tracker, in the order of their first appearance
+        self.accumulators = dict()
+        self.keys = []
+
+    # Update with the score of a finished video
+    def update(self, score):
+        for metric, values in score.results.items():
+            if metric not in ACCUMULATORS:
+                raise ValueError('Metric "{}" is not supported'.format(metric))
+            for tracker_name, value in values.items():
+                key = (metric, tracker_name)
+                if key not in self.accumulators:
+                    self.accumulators[key] = ACCUMULATORS[metric]()
+                    self.keys.append(key)
+                self.accumulators[key].update(value)
+
+    # Get the score of the dataset over the videos so far
+    def get_score(self):
+        score = Score(self.dataset_name, 'dataset')
+        for metric, tracker_name in self.keys:
+            with stage('metric', dataset = self.dataset_name, tracker = tracker_name, metric = metric):
+                value = self.accumulators[(metric, tracker_name)].result()
+            score.insert(tracker_name, metric, value)
+        return score
+
+# Get a copy of a score without the raw per-frame data and run results, which keeps the summaries
+# of metrics for reporting once the score is accumulated
+def compact_score(score):
+    compacted = Score(score.target_name, score.target_type)
+    for metric, values in score.results.items():
+        for tracker_name, value in values.items():
+            compacted.insert(tracker_name, metric, dict((k, v) for k, v in value.items() if k not in RAW_VALUE_KEYS))
+    return compacted
@@ -0,0 +1,220 @@
+'''Evaluation of trackers served out of process (e.g., model servers) with asyncio.
+
+This module requires Python 3.7+ and is not imported by the trkrutils package,
+import it explicitly: from trkrutils import async_evaluator
+'''
+import abc
+import asyncio
+from timeit import default_timer as timer
+from trkrutils.core import Score
+from trkrutils.accumulator import DatasetAccumulator, compact_score
+from trkrutils.loader import CachedVideo, DEFAULT_FRAME_CACHE_SIZE
+from trkrutils.evaluator import (
+    _TrackerRun,
+    _make_experiments,
+    _load_results,
+    _insert_metrics,
+    _stack_gt_regions,
+    METRICS,
+    DEFAULT_COMPACT,
+    DEFAULT_STOCHASTIC,
+    DEFAULT_STOCHASTIC_REPETITIONS,
+    DEFAULT_DETERMINISTIC_REPETITIONS
+)
+
+# The max number of tracker calls in flight
+DEFAULT_CONCURRENCY = 16
+# The max number of videos evaluated at the same time, which bounds the memory of decoded frames
+DEFAULT_VIDEO_CONCURRENCY = 4
+
+class AsyncTracker:
+    '''A tracker whose calls are coroutines, e.g. a client of a tracker server.
+    A tracker follows one sequence at a time, so a new tracker is created
+    by the given factory for each run'''
+
+    # The version of the tracker (see core.Tracker), the tracker behind a server is out of
+    # the source file of its client, so bump it whenever the served tracker changes
+    version = None
+
+    @abc.abstractmethod
+    async def init_frame(self, img, gt):
+        '''Load initialized frame and ground truth location
+        of tracked object in video, the image is read-only'''
+
+    @abc.abstractmethod
+    async def estimate(self, img):
+        '''Given an image (read-only) and return the
+        estimated location of tracked object'''
+
+    def get_config(self):
+        '''Return the configuration (a dict) of the tracker,
+        stored results are only reused for the same configuration.
+        Trackers should override it with everything affecting their
+        results, e.g. the model served by the server'''
+        return dict()
+
+    async def close(self):
+        '''Release the resources (e.g., connections) of the tracker
+        once its runs are finished'''
+
+# Feed a video to a tracker frame by frame, only the tracker calls are limited by the semaphore
+async def _run_tracker(run, video, semaphore):
+    loop = asyncio.get_event_loop()
+    video_length = video.length()
+    gt_regions = [None] * video_length
+
+    for idx in range(video_length):
+        # Stop once the rest frames are not needed (see evaluator._run_trackers)
+        if not run.needs_frame(video_length - 1):
+            break
+        action = run.next_action()
+        if action == _TrackerRun.SKIP:
+            run.update(idx, None, action)
+            continue
+
+        # Decode the frame in a thread, so the event loop keeps serving other runs
+        frame = await loop.run_in_executor(None, video.load_frame, idx)
+        gt_regions[idx] = frame.get_gt().to_array()
+        img = frame.get_img(with_gt = False)
+        estimated_region = None
+        async with semaphore:
+            # The time is the round trip of the call, excluding the wait for the semaphore
+            start = timer()
+            if action == _TrackerRun.INIT:
+                await run.tracker.init_frame(img, frame.get_gt())
+            else:
+                estimated_region = await run.tracker.estimate(img)
+            time = timer() - start
+        run.update(idx, frame, action, estimated_region, time)
+
+    return run.finish(_stack_gt_regions(gt_regions))
+
+async def _eval_video(tracker_factories, video, metrics, stochastic, cache_size, store, semaphore):
+    score = Score(video.name, 'video')
+    repetitions = DEFAULT_STOCHASTIC_REPETITIONS if stochastic else DEFAULT_DETERMINISTIC_REPETITIONS
+    experiments = _make_experiments(metrics)
+
+    # Decode the video once and share the frames with all runs
+    video = CachedVideo(video, cache_size)
+    video_length = video.length()
+
+    # The first tracker of each factory identifies the tracker (for its name and stored results),
+    # and follows the first unfinished run
+    trackers = [tracker_factory() for tracker_factory in tracker_factories]
+    created_trackers = list(trackers)
+    results = _load_results(video, trackers, experiments, repetitions, store)
+
+    # All unfinished runs are in flight at the same time, each run has its own tracker
+    runs_info = []
+    runs = []
+    idle_trackers = list(trackers)
+    for tracker_idx in range(len(trackers)):
+        for experiment in experiments:
+            for i in range(repetitions):
+                if results[(tracker_idx, experiment.name)][i] is not None:
+                    continue
+                tracker = idle_trackers[tracker_idx]
+                if tracker is None:
+                    tracker = tracker_factories[tracker_idx]()
+                    created_trackers.append(tracker)
+                idle_trackers[tracker_idx] = None
+                runs_info.append((tracker_idx, experiment, i))
+                runs.append(_TrackerRun(tracker, video_length, key = (experiment.name, i), **experiment.settings))
+
+    tasks = [asyncio.ensure_future(_run_tracker(run, video, semaphore)) for run in runs]
+    try:
+        run_results = await asyncio.gather(*tasks)
+    finally:
+        # If any run fails (or the evaluation is cancelled), the other runs are cancelled and
+        # finished before their trackers are closed
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions = True)
+        await asyncio.gather(*[tracker.close() for tracker in created_trackers])
+
+    for (tracker_idx, experiment, i), run_result in zip(runs_info, run_results):
+        results[(tracker_idx, experiment.name)][i] = run_result
+        if store is not None:
+            store.save(video, trackers[tracker_idx], experiment.name, i, experiment.settings, run_result)
+
+    _insert_metrics(score, [tracker.__class__.__name__ for tracker in trackers], experiments, results, video_length)
+
+    return [score]
+
+async def eval_video_async(
+    tracker_factories,
+    video,
+    metrics = METRICS,
+    stochastic = DEFAULT_STOCHASTIC,
+    cache_size = DEFAULT_FRAME_CACHE_SIZE,
+    store = None,
+    concurrency = DEFAULT_CONCURRENCY):
+    assert concurrency > 0, 'Concurrency must be > 0, but get {}'.format(concurrency)
+    return await _eval_video(tracker_factories, video, metrics, stochastic, cache_size, store, asyncio.Semaphore(concurrency))
+
+async def eval_dataset_async(
+    tracker_factories,
+    dataset,
+    metrics = METRICS,
+    stochastic = DEFAULT_STOCHASTIC,
+    cache_size = DEFAULT_FRAME_CACHE_SIZE,
+    store = None,
+    concurrency = DEFAULT_CONCURRENCY,
+    video_concurrency = DEFAULT_VIDEO_CONCURRENCY,
+    callback = None,
+    compact = DEFAULT_COMPACT):
+    assert concurrency > 0, 'Concurrency must be > 0, but get {}'.format(concurrency)
+    assert video_concurrency > 0, 'Video concurrency must be > 0, but get {}'.format(video_concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+    video_semaphore = asyncio.Semaphore(video_concurrency)
+    # The frame cache budget is shared by the videos evaluated at the same time
+    video_cache_size = cache_size // video_concurrency
+
+    async def eval_video(idx, video):
+        async with video_semaphore:
+            return idx, await _eval_video(tracker_factories, video, metrics, stochastic, video_cache_size, store, semaphore)
+
+    videos = dataset.get_videos()
+    tasks = [asyncio.ensure_future(eval_video(idx, video)) for idx, video in enumerate(videos)]
+    videos_scores = [None] * len(videos)
+
+    # The dataset metrics are accumulated as each video is finished (see evaluator.eval_dataset)
+    accumulator = DatasetAccumulator(dataset.name)
+    try:
+        for task in asyncio.as_completed(tasks):
+            idx, score = await task
+            for video_score in score:
+                accumulator.update(video_score)
+            if callback is not None:
+                callback(score[0], accumulator.get_score())
+            videos_scores[idx] = [compact_score(video_score) for video_score in score] if compact else score
+    finally:
+        # The videos in progress are cancelled if any video fails, and finished before returning
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions = True)
+
+    scores = [accumulator.get_score()]
+    for score in videos_scores:
+        scores.extend(score)
+
+    return scores
+
+# Evaluate async trackers on a dataset (or a video of it) in a new event loop
+def eval_async(
+    tracker_factories,
+    dataset,
+    metrics = METRICS,
+    stochastic = DEFAULT_STOCHASTIC,
+    video_name = None,
+    cache_size = DEFAULT_FRAME_CACHE_SIZE,
+    store = None,
+    concurrency = DEFAULT_CONCURRENCY,
+    video_concurrency = DEFAULT_VIDEO_CONCURRENCY,
+    callback = None,
+    compact = DEFAULT_COMPACT):
+    if video_name is not None:
+        coroutine = eval_video_async(tracker_factories, dataset.get_video(video_name), metrics, stochastic, cache_size, store, concurrency)
+    else:
+        coroutine = eval_dataset_async(tracker_factories, dataset, metrics, stochastic, cache_size, store, concurrency, video_concurrency, callback, compact)
+    return asyncio.run(coroutine)
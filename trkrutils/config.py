@@ -1,3 +1,8 @@
+# Each dataset may have an optional "manifest" dict, which maps the name of a zipped file
+# (video name for OTB, dataset name for VOT) to its expected size (in bytes) and SHA-256 checksum
+# for verifying downloads, e.g. 'manifest': {'Basketball': {'size': 1234, 'sha256': '...'}}.
+# A file without an entry is verified against the size told by the server, the entries can be
+# generated from trusted downloads by downloader.make_manifest.
 datasets = {
     'otb_v1.0': {
         'url_prefix': 'http://cvlab.hanyang.ac.kr/tracker_benchmark/seq',
@@ -5,3 +5,5 @@ DEFAULT_ESTIMATED_COLOR = (0, 0, 255)
 
 DEFAULT_DOWNLOAD_VERBOSE = True
 DEFAULT_DOWNLOAD_PATH = os.path.join(os.path.expanduser('~'), '.trkrutils')
+
+DEFAULT_RESULTS_PATH = os.path.join(DEFAULT_DOWNLOAD_PATH, 'results')
@@ -1,23 +1,77 @@
 import abc
 import cv2
 import math
+import numpy as np
+import os
 from trkrutils.consts import DEFAULT_GT_COLOR
 
 DEFAULT_WITH_GT = True
 DEFAULT_FPTS = 20
 
 class Tracker:
+    # The version of the tracker, stored results are only reused for the same version,
+    # so bump it whenever the code or the model of the tracker changes. If it is not set,
+    # the tracker is identified by the content of the source file of its class instead
+    version = None
+
     @abc.abstractmethod
     def init_frame(self, img, gt):
         '''Load initialized frame and ground truth location
-        of tracked object in video'''
+        of tracked object in video, the image is read-only'''
+
+    @abc.abstractmethod
+    def estimate(self, img):
+        '''Given an image (read-only) and return the
+        estimated location of tracked object'''
+
+    def get_config(self):
+        '''Return the configuration (a dict) of the tracker,
+        stored results are only reused for the same configuration.
+        Trackers should override it with everything affecting their
+        results, e.g. hyper-parameters and the path of model weights'''
+        return dict()
+
+class BatchTracker(Tracker):
+    '''A tracker which follows multiple independent sequences at once,
+    each sequence is identified by a hashable key. The evaluator batches
+    the runs (experiments and repetitions) of one video on the same frame,
+    runs of different videos are never in the same batch'''
 
     @abc.abstractmethod
+    def init_frame_batch(self, keys, imgs, gts):
+        '''(Re-)Initialize the sequences of given keys with their
+        frames and ground truth locations of tracked objects'''
+
+    @abc.abstractmethod
+    def estimate_batch(self, keys, imgs):
+        '''Given images of the sequences of given keys and return
+        a list of estimated locations of tracked objects'''
+
+    # Track a single sequence with the batched interface
+    def init_frame(self, img, gt):
+        self.init_frame_batch([None], [img], [gt])
+
     def estimate(self, img):
-        '''Given an image and return the estimated
-        location of tracked object'''
+        return self.estimate_batch([None], [img])[0]
+
+# Get the state of an object with __slots__ for pickling, slotted objects have no __dict__ by default
+def _get_slots_state(obj):
+    state = dict(getattr(obj, '__dict__', dict()))
+    for cls in type(obj).__mro__:
+        for name in getattr(cls, '__slots__', ()):
+            if hasattr(obj, name):
+                state[name] = getattr(obj, name)
+    return state
+
+# Restore the state of an object with __slots__ after unpickling
+def _set_slots_state(obj, state):
+    for name, value in state.items():
+        setattr(obj, name, value)
+
+class Region(object):
+    # Regions are created for every frame and kept by trackers, so they have no per-instance __dict__
+    __slots__ = ()
 
-class Region:
     @abc.abstractmethod
     def center(self):
         '''Compute the center of the region'''
@@ -31,6 +85,11 @@ class Region:
         '''Compute the intersection area between
         this and another region'''
 
+    @abc.abstractmethod
+    def to_array(self):
+        '''Get the region as a float array, which is
+        (x1, y1, x2, y2) for an axis-aligned box'''
+
     # Compute the center distance between this and another region
     def center_distance(self, region):
         center0 = self.center()
@@ -44,13 +103,22 @@ class Region:
     # Compute the ratio of overlap between this and another region
     def overlap_ratio(self, region):
         intersection_area = float(self.intersection(region))
-        union_area = float(self.union(region))
+        union_area = float(self.area() + region.area()) - intersection_area
         if union_area <= 0:
             return 0
         else:
             return intersection_area / union_area
 
+    # Pickling support for slotted regions
+    def __getstate__(self):
+        return _get_slots_state(self)
+
+    def __setstate__(self, state):
+        _set_slots_state(self, state)
+
 class SpecialRegion(Region):
+    __slots__ = ('code',)
+
     # The codes for special region
     UNDEFINED = 0
     INIT = 1
@@ -58,7 +126,27 @@ class SpecialRegion(Region):
 
     # Init function
     def __init__(self, code):
-        self.code = code
+        object.__setattr__(self, 'code', code)
+
+    # Special regions are immutable, since the instances are shared (see of)
+    def __setattr__(self, name, value):
+        raise AttributeError('Special region is immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError('Special region is immutable')
+
+    # Pickling support, a special region is re-created from its code
+    def __reduce__(self):
+        return (SpecialRegion, (self.code,))
+
+    # Get the shared instance of a code, a special region is never modified so one instance per code is enough
+    @staticmethod
+    def of(code):
+        return _SPECIAL_REGIONS[code]
+
+    # The array of special region is always NaN as in RunResult
+    def to_array(self):
+        return np.full(4, np.nan)
 
     # The center of special region is always (0, 0)
     def center(self):
@@ -72,7 +160,12 @@ class SpecialRegion(Region):
     def intersection(self, special_region):
         return 0
 
+# The shared instances of special regions
+_SPECIAL_REGIONS = dict((code, SpecialRegion(code)) for code in (SpecialRegion.UNDEFINED, SpecialRegion.INIT, SpecialRegion.FAILURE))
+
 class BoundingBox(Region):
+    __slots__ = ('x1', 'y1', 'x2', 'y2')
+
     # Init function
     def __init__(self, x1, y1, x2, y2):
         self.set(x1, y1, x2, y2)
@@ -106,21 +199,238 @@ class BoundingBox(Region):
     def area(self):
         return self.width() * self.height()
 
-    # Compute the intersection area between this and another bounding box
+    # Get the bounding box as an array of (x1, y1, x2, y2)
+    def to_array(self):
+        return np.array([self.x1, self.y1, self.x2, self.y2], dtype = np.float64)
+
+    # Get the corners of the bounding box
+    def get_points(self):
+        return [(self.x1, self.y1), (self.x2, self.y1), (self.x2, self.y2), (self.x1, self.y2)]
+
+    # Compute the intersection area between this and another bounding box (or polygon)
     def intersection(self, bbox):
+        if isinstance(bbox, Polygon):
+            return bbox.intersection(self)
         return max(0.0, min(self.x2, bbox.x2) - max(self.x1, bbox.x1)) * max(0.0, min(self.y2, bbox.y2) - max(self.y1, bbox.y1))
 
-class Frame:
-    # Init function
-    def __init__(self, img, x1, y1, x2, y2):
+# Compute the signed area of a polygon (a list of points), which is positive for counterclockwise points
+def _signed_area(points):
+    area = 0.0
+    for (x0, y0), (x1, y1) in zip(points, points[1:] + points[:1]):
+        area += x0 * y1 - x1 * y0
+    return area / 2.0
+
+# Clip a polygon by a convex polygon (Sutherland-Hodgman), both are lists of points
+def _clip_polygon(subject, clip):
+    orientation = 1.0 if _signed_area(clip) >= 0 else -1.0
+    output = list(subject)
+
+    for (ax, ay), (bx, by) in zip(clip, clip[1:] + clip[:1]):
+        if len(output) == 0:
+            break
+        # The points on the inner side of the clip edge have non-negative values
+        sides = [orientation * ((bx - ax) * (y - ay) - (by - ay) * (x - ax)) for x, y in output]
+        inputs = list(zip(output, sides))
+        output = []
+        prev, prev_side = inputs[-1]
+        for cur, cur_side in inputs:
+            if (cur_side >= 0) != (prev_side >= 0):
+                # The edge crosses the clip edge
+                t = prev_side / (prev_side - cur_side)
+                output.append((prev[0] + t * (cur[0] - prev[0]), prev[1] + t * (cur[1] - prev[1])))
+            if cur_side >= 0:
+                output.append(cur)
+            prev, prev_side = cur, cur_side
+
+    return output
+
+class Polygon(Region):
+    __slots__ = ('points', 'x1', 'y1', 'x2', 'y2')
+
+    # Init function, points is a list of (x, y), e.g. the corners of a rotated rectangle
+    def __init__(self, points):
+        self.points = [(float(x), float(y)) for x, y in points]
+        # The bounding box of the polygon, for trackers and drawing which use an axis-aligned box
+        xs = [x for x, y in self.points]
+        ys = [y for x, y in self.points]
+        self.x1 = int(math.floor(min(xs)))
+        self.y1 = int(math.floor(min(ys)))
+        self.x2 = int(math.floor(max(xs)))
+        self.y2 = int(math.floor(max(ys)))
+
+    # Draw polygon on an image
+    def draw(self, img, color):
+        cv2.polylines(img, [np.round(self.points).astype(np.int32)], True, color, 3)
+
+    # Compute the width of the bounding box of the polygon
+    def width(self):
+        return self.x2 - self.x1
+
+    # Compute the height of the bounding box of the polygon
+    def height(self):
+        return self.y2 - self.y1
+
+    # Get the points of the polygon
+    def get_points(self):
+        return self.points
+
+    # Get the polygon as an array of (x1, y1, ..., xK, yK)
+    def to_array(self):
+        return np.array(self.points, dtype = np.float64).reshape(-1)
+
+    # Compute the center (the mean of points) of the polygon
+    def center(self):
+        return (
+            sum(x for x, y in self.points) / len(self.points),
+            sum(y for x, y in self.points) / len(self.points)
+        )
+
+    # Compute the area of the polygon
+    def area(self):
+        return abs(_signed_area(self.points))
+
+    # Compute the intersection area between this and a convex region (a bounding box or a convex polygon)
+    def intersection(self, region):
+        if isinstance(region, SpecialRegion):
+            return 0
+        return abs(_signed_area(_clip_polygon(self.points, region.get_points())))
+
+# Normalize bounding boxes in an (N, 4) array, so x1 <= x2 and y1 <= y2 as BoundingBox does
+def _normalize_boxes(boxes):
+    return np.concatenate([
+        np.minimum(boxes[:, 0:2], boxes[:, 2:4]),
+        np.maximum(boxes[:, 0:2], boxes[:, 2:4])
+    ], axis = 1)
+
+# Convert an (N, 4) array of bounding boxes or an (N, 2K) array of polygons to an (N, K, 2) array of points
+def _to_points(regions):
+    if regions.shape[1] == 4:
+        boxes = _normalize_boxes(regions)
+        return boxes[:, [0, 1, 2, 1, 2, 3, 0, 3]].reshape((-1, 4, 2))
+    return regions.reshape((len(regions), -1, 2))
+
+# Compute the signed areas of polygons in an (N, M, 2) array of points, only the first counts[i] points of the i-th
+# polygon are used. The area is positive for counterclockwise points.
+def _signed_areas(points, counts):
+    idxs = np.arange(points.shape[1])[np.newaxis, :]
+    next_idxs = np.where(idxs + 1 < counts[:, np.newaxis], idxs + 1, 0)
+    next_points = np.take_along_axis(points, next_idxs[:, :, np.newaxis], axis = 1)
+    terms = points[:, :, 0] * next_points[:, :, 1] - next_points[:, :, 0] * points[:, :, 1]
+    return np.where(idxs < counts[:, np.newaxis], terms, 0.0).sum(axis = 1) / 2.0
+
+# Compute the areas of polygons (see _signed_areas)
+def _polygon_areas(points, counts):
+    return np.abs(_signed_areas(points, counts))
+
+# Clip polygons by convex polygons row by row (Sutherland-Hodgman over all rows at once), both are (N, K, 2) arrays
+# of points. Return the points of the clipped polygons (the first counts[i] points of the i-th row are valid) and counts.
+def _clip_polygons(subjects, clips):
+    n = len(subjects)
+    points = subjects
+    counts = np.full(n, subjects.shape[1], dtype = np.int64)
+    orientations = np.where(_signed_areas(clips, np.full(n, clips.shape[1])) >= 0, 1.0, -1.0)
+
+    for j in range(clips.shape[1]):
+        a = clips[:, j, np.newaxis, :]
+        b = clips[:, (j + 1) % clips.shape[1], np.newaxis, :]
+        idxs = np.arange(points.shape[1])[np.newaxis, :]
+        valid = idxs < counts[:, np.newaxis]
+        prev_idxs = np.where(idxs == 0, np.maximum(counts[:, np.newaxis] - 1, 0), idxs - 1)
+        prev_points = np.take_along_axis(points, prev_idxs[:, :, np.newaxis], axis = 1)
+
+        # The points on the inner side of the clip edge have non-negative values
+        sides = orientations[:, np.newaxis] * (
+            (b[:, :, 0] - a[:, :, 0]) * (points[:, :, 1] - a[:, :, 1]) -
+            (b[:, :, 1] - a[:, :, 1]) * (points[:, :, 0] - a[:, :, 0]))
+        prev_sides = np.take_along_axis(sides, prev_idxs, axis = 1)
+        inside = sides >= 0
+        crossing = valid & (inside != (prev_sides >= 0))
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            t = np.where(crossing, prev_sides / (prev_sides - sides), 0.0)
+        crossing_points = prev_points + t[:, :, np.newaxis] * (points - prev_points)
+
+        # Each point emits the crossing point (if any) followed by itself (if inside), the emitted points are
+        # moved to the front of each row in order
+        candidates = np.stack([crossing_points, points], axis = 2).reshape((n, -1, 2))
+        emitted = np.stack([crossing, valid & inside], axis = 2).reshape((n, -1))
+        order = np.argsort(~emitted, axis = 1, kind = 'stable')
+        counts = emitted.sum(axis = 1)
+        width = max(int(counts.max()) if n > 0 else 0, 1)
+        points = np.take_along_axis(candidates, order[:, :width, np.newaxis], axis = 1)
+
+    return points, counts
+
+# Compute the overlap ratios between two arrays of regions row by row, each array is an (N, 4) array of bounding boxes
+# (x1, y1, x2, y2) or an (N, 2K) array of polygons (x1, y1, ..., xK, yK). The regions of the second array must be convex
+# if any of them is a polygon. The ratio is NaN for rows with NaN (e.g., the special regions of a RunResult).
+def overlap_ratios(regions0, regions1):
+    regions0 = np.asarray(regions0, dtype = np.float64)
+    regions1 = np.asarray(regions1, dtype = np.float64)
+    regions0 = regions0.reshape((-1, regions0.shape[-1]))
+    regions1 = regions1.reshape((-1, regions1.shape[-1]))
+    undefined = np.isnan(regions0).any(axis = 1) | np.isnan(regions1).any(axis = 1)
+    # The polygons of empty arrays can not be reshaped to points
+    if len(regions0) == 0:
+        return np.zeros(0)
+
+    if regions0.shape[1] == 4 and regions1.shape[1] == 4:
+        boxes0 = _normalize_boxes(regions0)
+        boxes1 = _normalize_boxes(regions1)
+        sizes = np.maximum(0.0, np.minimum(boxes0[:, 2:4], boxes1[:, 2:4]) - np.maximum(boxes0[:, 0:2], boxes1[:, 0:2]))
+        intersection_areas = sizes[:, 0] * sizes[:, 1]
+        areas0 = (boxes0[:, 2] - boxes0[:, 0]) * (boxes0[:, 3] - boxes0[:, 1])
+        areas1 = (boxes1[:, 2] - boxes1[:, 0]) * (boxes1[:, 3] - boxes1[:, 1])
+    else:
+        points0 = _to_points(np.where(undefined[:, np.newaxis], 0.0, regions0))
+        points1 = _to_points(np.where(undefined[:, np.newaxis], 0.0, regions1))
+        clipped_points, clipped_counts = _clip_polygons(points0, points1)
+        intersection_areas = _polygon_areas(clipped_points, clipped_counts)
+        areas0 = _polygon_areas(points0, np.full(len(points0), points0.shape[1]))
+        areas1 = _polygon_areas(points1, np.full(len(points1), points1.shape[1]))
+
+    union_areas = areas0 + areas1 - intersection_areas
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        ratios = np.where(union_areas > 0, intersection_areas / union_areas, 0.0)
+    ratios[undefined] = np.nan
+    return ratios
+
+# Compute the centers of an (N, 4) array of bounding boxes or an (N, 2K) array of polygons
+def _centers(regions):
+    if regions.shape[1] == 4:
+        return (regions[:, 0:2] + regions[:, 2:4]) / 2.0
+    # The number of points is given explicitly, since it can not be inferred from an empty array
+    return regions.reshape((len(regions), regions.shape[1] // 2, 2)).mean(axis = 1)
+
+# Compute the center distances between two arrays of regions (see overlap_ratios) row by row
+def center_distances(regions0, regions1):
+    regions0 = np.asarray(regions0, dtype = np.float64)
+    regions1 = np.asarray(regions1, dtype = np.float64)
+    offsets = _centers(regions0.reshape((-1, regions0.shape[-1]))) - _centers(regions1.reshape((-1, regions1.shape[-1])))
+    return np.hypot(offsets[:, 0], offsets[:, 1])
+
+class Frame(object):
+    __slots__ = ('img', 'gt')
+
+    # Init function, the ground truth is a bounding box unless another region (e.g., a polygon) is given
+    def __init__(self, img, x1 = None, y1 = None, x2 = None, y2 = None, gt = None):
+        # The decoded image may be cached and shared across trackers, repetitions and threads,
+        # so it is read-only and never drawn on
+        if img is not None:
+            img.setflags(write = False)
         self.img = img
-        self.gt = BoundingBox(x1, y1, x2, y2)
+        self.gt = BoundingBox(x1, y1, x2, y2) if gt is None else gt
+
+    # Render an annotated copy of the image with a list of (region, color) drawn on it
+    def render(self, regions):
+        img = self.img.copy()
+        for region, color in regions:
+            region.draw(img, color)
+        return img
 
-    # Get the frame with/without drawn groud truth
+    # Get the frame with/without drawn groud truth, the drawn one is a new copy
     def get_img(self, with_gt = DEFAULT_WITH_GT, gt_color = DEFAULT_GT_COLOR):
         if with_gt:
-            self.gt.draw(self.img, gt_color)
-            return self.img
+            return self.render([(self.gt, gt_color)])
         else:
             return self.img
 
@@ -128,12 +438,24 @@ class Frame:
     def get_gt(self):
         return self.gt
 
+    # Pickling support for slotted frames
+    def __getstate__(self):
+        return _get_slots_state(self)
+
+    def __setstate__(self, state):
+        _set_slots_state(self, state)
+
 class Video:
+    # The file name of the ground truth index cached next to the sequence, the version
+    # is bumped whenever the parsing of ground truth files changes
+    GT_CACHE_NAME = '.groundtruth-v2.npy'
+
     # Init function
     def __init__(self, dataset_name, name, path):
         self.dataset_name = dataset_name
         self.name = name
         self.path = path
+        self.groundtruth = None
 
     # Show an image
     def show_img(self, img, period):
@@ -141,20 +463,95 @@ class Video:
         cv2.imshow(window_name, img)
         cv2.waitKey(period)
 
-    # Load frames from disk
+    # Load a specified frame (0-based index) from disk
+    def load_frame(self, idx):
+        return None
+
+    # Iterate over frames one by one, decoding each frame only when needed
+    def iter_frames(self):
+        for idx in range(self.length()):
+            yield self.load_frame(idx)
+
+    # Load all frames from disk
     def load_frames(self):
-        return []
+        return list(self.iter_frames())
+
+    # Get a dict describing how the frames are produced from the original sequence, results of
+    # the same video from different sources (e.g., downscaled frames) are not interchangeable
+    def get_source(self):
+        return dict()
+
+    # Get the path of a file in the video folder
+    def file_path(self, name):
+        return os.path.join(self.path, name)
+
+    # Read lines of a text file in the video folder
+    def read_lines(self, name):
+        with open(self.file_path(name)) as f:
+            return f.readlines()
+
+    # Read and decode an image in the video folder
+    def read_img(self, name):
+        return cv2.imread(self.file_path(name))
+
+    # Get the path of the ground truth text file
+    def groundtruth_path(self):
+        return None
+
+    # Parse the ground truth text file into an (N, 4) or (N, 8) float array
+    def parse_groundtruth(self):
+        return np.zeros((0, 4))
+
+    # Load the ground truth index, it is parsed only once and cached in memory and on disk
+    def load_groundtruth(self):
+        if self.groundtruth is not None:
+            return self.groundtruth
+
+        gt_path = self.groundtruth_path()
+        if gt_path is None:
+            self.groundtruth = self.parse_groundtruth()
+            return self.groundtruth
+
+        # Use the cache on disk if it is not older than the ground truth file
+        cache_path = os.path.join(self.path, Video.GT_CACHE_NAME)
+        if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(gt_path):
+            self.groundtruth = np.load(cache_path)
+            return self.groundtruth
+
+        self.groundtruth = self.parse_groundtruth()
+        try:
+            # Write to a temporary file first, so a partial cache is never loaded
+            tmp_path = '{}.{}.tmp'.format(cache_path, os.getpid())
+            with open(tmp_path, 'wb') as f:
+                np.save(f, self.groundtruth)
+            os.rename(tmp_path, cache_path)
+        except (IOError, OSError):
+            # The dataset may be read-only, the in-memory cache still works
+            pass
+
+        return self.groundtruth
+
+    # Get the ground truth bounding boxes (x1, y1, x2, y2) of all frames as an (N, 4) array,
+    # subclasses convert the ground truth index directly without loading frames
+    def load_gt_boxes(self):
+        gts = [frame.get_gt() for frame in self.iter_frames()]
+        return np.array([[gt.x1, gt.y1, gt.x2, gt.y2] for gt in gts], dtype = np.float64).reshape((-1, 4))
+
+    # Get the ground truth regions of all frames as an array, which is an (N, 4) array of bounding boxes
+    # or an (N, 2K) array of polygons as the ground truth of frames
+    def load_gt_regions(self):
+        return np.array([frame.get_gt().to_array() for frame in self.iter_frames()], dtype = np.float64)
 
     # Get length (# of frames) of the video
     def length(self):
-        return 0
+        return len(self.load_groundtruth())
 
     # Show the video
     def show(self, with_gt = DEFAULT_WITH_GT, gt_color = DEFAULT_GT_COLOR, fps = DEFAULT_FPTS):
         # The period (in milliseconds) to show a frame
         frame_period = 1000 / fps
         # Load and show video frame by frame
-        for frame in self.load_frames():
+        for frame in self.iter_frames():
             self.show_img(frame.get_img(with_gt, gt_color), frame_period)
 
 class Dataset:
@@ -184,6 +581,72 @@ class Dataset:
         for video in self.videos:
             video.show(with_gt, gt_color, fps)
 
+class RunResult:
+    # The status code of a frame with an estimated region, other codes are the same as SpecialRegion
+    TRACKED = 3
+
+    # Init function
+    def __init__(self, length = 0):
+        # The estimated bounding boxes (x1, y1, x2, y2), NaN for special regions
+        self.boxes = np.full((length, 4), np.nan, dtype = np.float32)
+        # The overlap ratios and center distances, NaN for frames without an estimated region
+        self.overlap_ratios = np.full(length, np.nan)
+        self.center_distances = np.full(length, np.nan)
+        # The status code of each frame
+        self.status = np.full(length, SpecialRegion.UNDEFINED, dtype = np.int8)
+        # The time (in seconds) spent by the tracker on each frame, NaN for frames skipped by the tracker
+        self.times = np.full(length, np.nan)
+
+    # Concatenate results of multiple runs into one result
+    @staticmethod
+    def concatenate(run_results):
+        result = RunResult()
+        if len(run_results) > 0:
+            result.boxes = np.concatenate([r.boxes for r in run_results])
+            result.overlap_ratios = np.concatenate([r.overlap_ratios for r in run_results])
+            result.center_distances = np.concatenate([r.center_distances for r in run_results])
+            result.status = np.concatenate([r.status for r in run_results])
+            result.times = np.concatenate([r.times for r in run_results])
+        return result
+
+    # Get length (# of frames) of the run
+    def length(self):
+        return len(self.status)
+
+    # Set the region of a frame with its overlap ratio, center distance and time spent by the tracker
+    def set(self, idx, region, overlap_ratio = float('nan'), center_distance = float('nan'), time = float('nan')):
+        if isinstance(region, SpecialRegion):
+            self.status[idx] = region.code
+        else:
+            self.status[idx] = RunResult.TRACKED
+            self.boxes[idx] = (region.x1, region.y1, region.x2, region.y2)
+        self.overlap_ratios[idx] = overlap_ratio
+        self.center_distances[idx] = center_distance
+        self.times[idx] = time
+
+    # Get the region of a frame
+    def get_region(self, idx):
+        if self.status[idx] == RunResult.TRACKED:
+            return BoundingBox(*self.boxes[idx].tolist())
+        return SpecialRegion.of(int(self.status[idx]))
+
+    # Get the trajectory as a list of regions
+    def get_trajectory(self):
+        return [self.get_region(idx) for idx in range(self.length())]
+
+    # Count the frames with a specified status code
+    def count(self, code):
+        return int(np.count_nonzero(self.status == code))
+
+    # Recompute the overlap ratios and center distances of the estimated regions against given
+    # ground truth regions (an (N, 4) array of bounding boxes or an (N, 2K) array of polygons,
+    # see Video.load_gt_regions)
+    def rescore(self, gt_regions):
+        tracked = self.status == RunResult.TRACKED
+        boxes = np.where(tracked[:, np.newaxis], self.boxes, np.nan)
+        self.overlap_ratios = overlap_ratios(gt_regions, boxes)
+        self.center_distances = np.where(tracked, center_distances(gt_regions, boxes), np.nan)
+
 class Score:
     # Init function
     def __init__(self, target_name, target_type, results = None):
@@ -205,4 +668,4 @@ class Score:
 
     # Get list of all metrics names
     def get_metrics(self):
-        return self.results.iterkeys()
+        return list(self.results.keys())
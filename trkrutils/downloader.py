@@ -1,36 +1,123 @@
 import os
-import urllib
-import wget
+import hashlib
 import zipfile
+from multiprocessing.pool import ThreadPool
 from trkrutils.config import datasets as DATASETS
 from trkrutils.consts import DEFAULT_DOWNLOAD_VERBOSE, DEFAULT_DOWNLOAD_PATH
 
+try:
+    from urllib2 import urlopen, Request, HTTPError
+except ImportError:
+    from urllib.request import urlopen, Request
+    from urllib.error import HTTPError
+
 DONE_FILE_NAME = '.done'
+PARTIAL_FILE_SUFFIX = '.part'
+
+DEFAULT_DOWNLOAD_WORKERS = 4
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+# Compute the SHA-256 checksum of a file
+def _sha256(filename):
+    sha256 = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(DEFAULT_CHUNK_SIZE), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+# Check a downloaded file against the expected size and checksum (if known)
+def _verify(filename, size = None, checksum = None):
+    if not os.path.exists(filename):
+        return False
+    if size is not None and os.path.getsize(filename) != size:
+        return False
+    if checksum is not None and _sha256(filename) != checksum:
+        return False
+    return True
+
+# Get the size of the whole file from a "Content-Range" header, e.g. "bytes */1234" or "bytes 0-99/1234"
+def _content_range_size(content_range):
+    if content_range is None:
+        return None
+    total = content_range.strip().split('/')[-1]
+    return int(total) if total.isdigit() else None
+
+# Download a file to the partial file, or resume it if the partial file exists. Return whether the partial file
+# is resumed, and the size of the whole file told by the server (None if unknown).
+def _receive(url, partial, verbose = DEFAULT_DOWNLOAD_VERBOSE):
+    # Resume from the partially downloaded file (if any) by a HTTP range request
+    offset = os.path.getsize(partial) if os.path.exists(partial) else 0
+    request = Request(url)
+    if offset > 0:
+        request.add_header('Range', 'bytes={}-'.format(offset))
 
-def _download_url(url, out, verbose = DEFAULT_DOWNLOAD_VERBOSE):
-    # If the file exists, do nothing
-    if os.path.exists(out):
+    if verbose:
+        print('Download {} to {}{}...'.format(url, partial, ' (resume from {} bytes)'.format(offset) if offset > 0 else ''))
+
+    try:
+        response = urlopen(request)
+    except HTTPError as e:
+        if e.code != 416 or offset == 0:
+            raise
+        # The range is not satisfiable, the partial file may be already complete,
+        # so the size of the whole file is taken from the response for verification
+        return True, _content_range_size(e.info().get('Content-Range'))
+
+    size = None
+    try:
+        # The server may ignore the range and send the whole file
+        if offset > 0 and response.getcode() != 206:
+            offset = 0
+        content_length = response.info().get('Content-Length')
+        if content_length is not None:
+            size = offset + int(content_length)
+        with open(partial, 'ab' if offset > 0 else 'wb') as f:
+            for chunk in iter(lambda: response.read(DEFAULT_CHUNK_SIZE), b''):
+                f.write(chunk)
+    finally:
+        response.close()
+
+    return offset > 0, size
+
+# Download a file and verify it against the expected size and checksum in the manifest (if any),
+# otherwise against the size told by the server
+def _download_url(url, out, verbose = DEFAULT_DOWNLOAD_VERBOSE, size = None, checksum = None):
+    # If the file exists and is verified, do nothing.
+    # A file is only renamed to its final name after it is completely downloaded.
+    if _verify(out, size, checksum):
         return
 
     # Create a new folder is the folder of output file does not exist
     path = os.path.dirname(out)
-    if not os.path.isdir(path):
-        os.makedirs(path)
+    if path and not os.path.isdir(path):
+        try:
+            os.makedirs(path)
+        except OSError:
+            # The folder may be created by another download at the same time
+            if not os.path.isdir(path):
+                raise
 
-    # Now, download the file
-    out = os.path.join(path, out)
-    if not verbose:
-        wget.download(url, out, bar = None)
-    else:
-        print 'Download {} to {}...'.format(url, out)
-        wget.download(url, out)
-        # The bar in wget does not have new line, we should add a new line manually
-        print ""
+    # A resumed partial file may be stale or corrupted, so it is downloaded again from scratch
+    # if it fails the verification, or if it can not be verified at all
+    partial = out + PARTIAL_FILE_SUFFIX
+    for _ in range(2):
+        resumed, server_size = _receive(url, partial, verbose)
+        expected_size = size if size is not None else server_size
+        verifiable = expected_size is not None or checksum is not None
+        if (verifiable or not resumed) and _verify(partial, expected_size, checksum):
+            os.rename(partial, out)
+            return
+        if os.path.exists(partial):
+            os.remove(partial)
+        if not resumed:
+            break
+
+    raise IOError('Downloaded file "{}" from {} is corrupted'.format(out, url))
 
 def _unzip_file(filename, verbose = DEFAULT_DOWNLOAD_VERBOSE):
     # Print message for verbose mode
     if verbose:
-        print 'Extracting {}...'.format(filename)
+        print('Extracting {}...'.format(filename))
 
     # Now, extract the zipped file
     path = os.path.dirname(filename)
@@ -44,10 +131,30 @@ def _is_downloaded(path):
 def _mark_downloaded(path):
     open(os.path.join(path, DONE_FILE_NAME), 'w').close()
 
-def download(dataset_name, root_path = DEFAULT_DOWNLOAD_PATH, verbose = DEFAULT_DOWNLOAD_VERBOSE):
+# Download and verify a zipped file, then extract it (if need) and mark its folder as downloaded
+def _fetch(task):
+    url, zip_name, done_path, manifest_entry, extract, verbose = task
+    _download_url(url, zip_name, verbose, manifest_entry.get('size'), manifest_entry.get('sha256'))
+    if extract:
+        _unzip_file(zip_name, verbose)
+        _mark_downloaded(done_path)
+
+# Download and extract (if need) a dataset. Each zipped file is verified against its entry in the manifest
+# of config.datasets (size and SHA-256 checksum). The datasets are shipped without manifest entries,
+# so by default a file is only verified against the size told by the server, which catches truncated
+# downloads but not corrupted ones. Generate the entries with make_manifest from trusted downloads
+# to verify the checksums as well.
+def download(
+    dataset_name,
+    root_path = DEFAULT_DOWNLOAD_PATH,
+    verbose = DEFAULT_DOWNLOAD_VERBOSE,
+    workers = DEFAULT_DOWNLOAD_WORKERS,
+    extract = True):
     assert dataset_name in DATASETS.keys(), 'Dataset "{}" is not supported'.format(dataset_name)
 
     dataset_path = os.path.join(root_path, dataset_name)
+    manifest = DATASETS[dataset_name].get('manifest', dict())
+    tasks = []
 
     if dataset_name.startswith('otb'):
         url_prefix = DATASETS[dataset_name]['url_prefix']
@@ -56,16 +163,41 @@ def download(dataset_name, root_path = DEFAULT_DOWNLOAD_PATH, verbose = DEFAULT_
             url = '{}/{}.zip'.format(url_prefix, video)
             video_dir = os.path.join(dataset_path, video)
             zip_name = '{}.zip'.format(video_dir)
-            if not _is_downloaded(video_dir):
-                _download_url(url, zip_name, verbose)
-                _unzip_file(zip_name, dataset_path)
-                _mark_downloaded(video_dir)
+            if not (extract and _is_downloaded(video_dir)):
+                tasks.append((url, zip_name, video_dir, manifest.get(video, dict()), extract, verbose))
     elif dataset_name.startswith('vot'):
         url = DATASETS[dataset_name]['url']
-        zip_name = '{}/{}.zip'.format(dataset_path, dataset_name)
-        if not _is_downloaded(dataset_path):
-            _download_url(url, dataset_path, verbose)
-            _unzip_file(zip_name, dataset_path)
-            _mark_downloaded(dataset_path)
+        zip_name = os.path.join(dataset_path, '{}.zip'.format(dataset_name))
+        if not (extract and _is_downloaded(dataset_path)):
+            tasks.append((url, zip_name, dataset_path, manifest.get(dataset_name, dict()), extract, verbose))
+
+    # Download files concurrently, each file is extracted as soon as it is downloaded,
+    # so extraction overlaps with the other downloads
+    if len(tasks) > 0:
+        pool = ThreadPool(max(1, min(workers, len(tasks))))
+        try:
+            pool.map(_fetch, tasks)
+        finally:
+            pool.close()
+            pool.join()
 
     return dataset_path
+
+# Generate the manifest of a downloaded dataset for config.datasets, which maps the name of each
+# zipped file to its size and SHA-256 checksum. The files should be verified by other means first.
+def make_manifest(dataset_name, root_path = DEFAULT_DOWNLOAD_PATH):
+    assert dataset_name in DATASETS.keys(), 'Dataset "{}" is not supported'.format(dataset_name)
+
+    dataset_path = os.path.join(root_path, dataset_name)
+    if dataset_name.startswith('otb'):
+        names = DATASETS[dataset_name]['videos']
+    else:
+        names = [dataset_name]
+
+    manifest = dict()
+    for name in names:
+        zip_name = os.path.join(dataset_path, '{}.zip'.format(name))
+        if os.path.exists(zip_name):
+            manifest[name] = {'size': os.path.getsize(zip_name), 'sha256': _sha256(zip_name)}
+
+    return manifest
@@ -1,6 +1,9 @@
 import numpy as np
 import math
 
+# The number of mixture components evaluated at once, which bounds the memory of pairwise terms
+BLOCK_SIZE = 512
+
 def estimate_eao_interval(sequence_lengths, threshold):
     model = _gmm_estimate(sequence_lengths)
 
@@ -98,6 +101,8 @@ def _optimal_bandwidth(Mu, Cov, w, Cov_smp, N_eff):
 
 # Calculates an integral over the squared Hessian of a Gaussian mixture model.
 # Follows Wand and Jones "Kernel Smoothing", page 101., assuming H = h * F.
+# All the components are one-dimensional, so the pairwise terms are evaluated with broadcasting
+# in blocks of rows instead of inverting 1x1 matrices in a double loop.
 def _integral_squared_hessian(Mu, w, Cov, F, G):
     if not Mu:
         return float('nan')
@@ -105,61 +110,44 @@ def _integral_squared_hessian(Mu, w, Cov, F, G):
     # Read dimension and number of components
     d = 1
     N = len(Mu)
+    Mu = np.asarray(Mu, dtype = np.float64)
+    w = np.asarray(w, dtype = np.float64)
+    Cov = np.asarray(Cov, dtype = np.float64)
+    F = float(np.asarray(F, dtype = np.float64).ravel()[0])
 
     # Precompute normalizer constNorm = (1 / 2pi) ^ (d / 2)
     constNorm = math.pow((1.0 / (2 * math.pi)), (d / 2.0))
-    I = 0
+    I = 0.0
 
     # Test if F is identity for speedup
-    delta_F = sum(sum(abs(np.subtract(F, np.identity(1)))))
-    if delta_F < 0.001:
-        # Generate a summation over the nonsymmetric matrix
-        for l1 in range(N):
-            S1 = Cov[l1] + G
-            Mu1 = Mu[l1]
-            w1 = w[l1]
-            for l2 in range(l1, N):
-                S2 = Cov[l2]
-                Mu2 = Mu[l2]
-                w2 = w[l2]
-                A = np.linalg.inv([[S1 + S2]])
-                dm = Mu1 - Mu2
-                m = np.dot(np.dot(dm, A), dm)[0][0]
-                f_t = constNorm * math.sqrt(np.linalg.det(A)) * math.exp(np.dot(-0.5, m))
-                c = 2 * sum(sum(np.multiply(A, np.transpose(A)))) * (1 - 2 * m) + math.pow(1 - m, 2) * math.pow(np.trace(A), 2)
-
-                # Determine the weight of the term current
-                if l1 == l2:
-                    eta = 1
-                else:
-                    eta = 2
-                I = I + f_t * c * w2 * w1 * eta
-    else:
-        # Generate a summation over the nonsymmetric matrix
-        for l1 in range(N):
-            S1 = Cov[l1]
-            Mu1 =Mu[l1]
-            w1 = w[l1]
-            for l2 in range(l1, N):
-                S2 = Cov[l2] + G
-                Mu2 = Mu[l2]
-                w2 = w[l2]
-                A = np.linalg.inv([[S1 + S2]])
-                dm = Mu1 - Mu2
-                ds = np.dot(dm, A)
-                b = np.dot(ds, ds)
-                B = np.subtract(A, np.multiply(2, b))
-                C = np.subtract(A, b)
-
-                f_t = constNorm * math.sqrt(np.linalg.det(A)) * math.exp(-0.5 * ds * dm)
-                c = 2 * np.trace(F * A * F * B) + math.pow(np.trace(F * C), 2)
-
-                # Determine the weight of the term current
-                if l1 == l2:
-                    eta = 1
-                else:
-                    eta = 2
-                I = I + f_t * c * w2 * w1 * eta
+    is_identity = abs(F - 1.0) < 0.001
+
+    for start in range(0, N, BLOCK_SIZE):
+        # Terms of components l1 in the block against all components l2 >= l1
+        l1 = np.arange(start, min(start + BLOCK_SIZE, N))[:, np.newaxis]
+        l2 = np.arange(N)[np.newaxis, :]
+        if is_identity:
+            A = 1.0 / ((Cov[l1] + G) + Cov[l2])
+        else:
+            A = 1.0 / (Cov[l1] + (Cov[l2] + G))
+        dm = Mu[l1] - Mu[l2]
+
+        with np.errstate(invalid = 'ignore'):
+            if is_identity:
+                m = dm * A * dm
+                f_t = constNorm * np.sqrt(A) * np.exp(-0.5 * m)
+                c = 2 * A * A * (1 - 2 * m) + np.power(1 - m, 2) * np.power(A, 2)
+            else:
+                ds = dm * A
+                b = ds * ds
+                B = A - 2 * b
+                C = A - b
+                f_t = constNorm * np.sqrt(A) * np.exp(-0.5 * ds * dm)
+                c = 2 * (F * A * F * B) + np.power(F * C, 2)
+
+        # Determine the weight of the terms, the terms with l1 != l2 are counted twice
+        eta = np.where(l1 == l2, 1.0, 2.0) * (l2 >= l1)
+        I += float(np.sum(f_t * c * w[l2] * w[l1] * eta))
 
     return I
 
@@ -173,21 +161,24 @@ def _integral_squared_hessian(Mu, w, Cov, F, G):
 # p (vector): values for corresponding points
 def _gmm_evaluate(model, X):
     d = 1
-    num_data = len(X)
-    p = np.zeros(num_data)
-
-    for idx in range(len(model['w'])):
-        iS = np.linalg.cholesky(np.linalg.inv([[model['Cov'][idx]]]))
-        logdetiS = sum(np.log(np.diag(iS)))
+    X = np.asarray(X, dtype = np.float64)
+    Mu = np.asarray(model['Mu'], dtype = np.float64)
+    Cov = np.asarray(model['Cov'], dtype = np.float64)
+    w = np.asarray(model['w'], dtype = np.float64)
+    p = np.zeros(len(X))
+
+    for start in range(0, len(w), BLOCK_SIZE):
+        block = slice(start, start + BLOCK_SIZE)
+        # The Cholesky factor of the inverse of a 1x1 covariance is 1 / sqrt(cov)
+        iS = 1.0 / np.sqrt(Cov[block])
+        logdetiS = np.log(iS)
         # log2pi = 1.83787706640935
         logConstant = logdetiS - 0.5 * d * 1.83787706640935
-        dx = np.subtract(X, np.full(num_data, model['Mu'][idx])).tolist()
-        dx = np.multiply(iS[0][0], dx)
-        pl = np.subtract(logConstant, np.multiply(0.5, np.multiply(dx, dx)))
-        p_tmp = np.exp(pl)
-        p = np.add(p, np.multiply(model['w'][idx], p_tmp)).tolist()
+        dx = (X[:, np.newaxis] - Mu[np.newaxis, block]) * iS[np.newaxis, :]
+        pl = logConstant[np.newaxis, :] - 0.5 * dx * dx
+        p += np.dot(np.exp(pl), w[block])
 
-    return p
+    return p.tolist()
 
 def _find_range(p, density):
     # Find maximum on the KDE
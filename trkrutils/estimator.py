@@ -1,7 +1,9 @@
 import math
+import numpy as np
 from trkrutils.utils import mean, merge_dict
-from trkrutils.core import SpecialRegion
+from trkrutils.core import SpecialRegion, RunResult
 from trkrutils.eao import estimate_eao_interval
+from trkrutils.profiler import stage
 
 DEFAULT_SENSITIVITY = 100
 
@@ -11,75 +13,74 @@ DEFAULT_PRECISION_SCORE_THRESHOLD = 20
 DEFAULT_EAO_INTERVAL_THRESHOLD = 0.5
 
 def _compute_per_frame_ratios(overlap_ratios_list):
-    per_frame_ratios = []
-
     # Compute per-frame overlap ratio by averaging the frame in different sequence
     # XXX: We assume the list contains at least 1 sequence and all sequence have the same length
-    for frame_idx in range(len(overlap_ratios_list[0])):
-        ratios = []
-        for sequence_idx in range(len(overlap_ratios_list)):
-            overlap_ratio = overlap_ratios_list[sequence_idx][frame_idx]
-            if not math.isnan(overlap_ratio):
-                ratios.append(overlap_ratio)
-        if len(ratios) > 0:
-            per_frame_ratio = mean(ratios)
-            per_frame_ratios.append(per_frame_ratio)
+    ratios = np.asarray(overlap_ratios_list, dtype = np.float64).reshape((len(overlap_ratios_list), -1))
+    valid = ~np.isnan(ratios)
+    counts = valid.sum(axis = 0)
+    sums = np.where(valid, ratios, 0.0).sum(axis = 0)
+    # Frames without any valid ratio (e.g., initialization or failure) are dropped
+    defined = counts > 0
+    per_frame_ratios = sums[defined] / counts[defined]
 
     return per_frame_ratios
 
-def estimate_success_plot(overlap_ratios_list):
-    per_frame_ratios = _compute_per_frame_ratios(overlap_ratios_list)
-    curr_threshold = 0.0
-    thresholds = [curr_threshold]
-    success_rates = []
+# Compute the area under a curve by the trapezoidal rule
+def _trapezoid_area(xs, ys):
+    xs = np.asarray(xs, dtype = np.float64)
+    ys = np.asarray(ys, dtype = np.float64)
+    return float(np.sum(np.diff(xs) * (ys[1:] + ys[:-1]) / 2.0))
 
-    # Sort the overlapp scores for computing success rates and thresholds
-    sorted_per_frame_ratios = sorted(per_frame_ratios)
-    # Compute success rates and thresholds
-    total_count = len(per_frame_ratios)
-    for idx, per_frame_ratio in enumerate(sorted_per_frame_ratios):
-        if curr_threshold < per_frame_ratio:
-            success_rates.append(float(total_count - idx) / float(total_count))
-            curr_threshold = per_frame_ratio
-            thresholds.append(curr_threshold)
-    # Handle edge cases
-    if len(thresholds) > 1:
-        thresholds[-1] = 1.0
-        success_rates.append(0.0)
+# Compute the thresholds and success rates of a success plot from the sorted per-frame overlap ratios
+def _success_rates(sorted_per_frame_ratios, thresholds = None):
+    total_count = len(sorted_per_frame_ratios)
+
+    if thresholds is None:
+        # By default, the thresholds are 0, the distinct positive overlap ratios except the highest one, and 1
+        distinct_ratios = np.unique(sorted_per_frame_ratios[sorted_per_frame_ratios > 0.0])
+        thresholds = [0.0] + distinct_ratios[:-1].tolist() + [1.0]
     else:
-        thresholds.append(1.0)
-        success_rates.extend([0.0, 0.0])
+        thresholds = [float(x) for x in thresholds]
+
+    # The success rate is the ratio of frames whose overlap ratio is higher than the threshold
+    higher_counts = total_count - np.searchsorted(sorted_per_frame_ratios, thresholds, side = 'right')
+    success_rates = (higher_counts / float(max(total_count, 1))).tolist()
+
+    return thresholds, success_rates
+
+def estimate_success_plot(run_results, thresholds = None):
+    per_frame_ratios = _compute_per_frame_ratios([r.overlap_ratios for r in run_results])
+    # Sort the overlapp scores for computing success rates and thresholds
+    thresholds, success_rates = _success_rates(np.sort(per_frame_ratios), thresholds)
 
     # Compute auc (area under curve)
-    auc = 0.0
-    for idx in range(1, len(thresholds)):
-        base = thresholds[idx] - thresholds[idx - 1]
-        height = (success_rates[idx] + success_rates[idx - 1]) / 2.0
-        auc += base * height
+    auc = _trapezoid_area(thresholds, success_rates)
 
     return {
         'thresholds': thresholds,
         'success_rates': success_rates,
         'auc': auc,
         'per_frame_ratios': per_frame_ratios,
-        'overlap_ratios_list': overlap_ratios_list
+        'run_results': run_results
     }
 
 def estimate_precision_plot(
-    center_distances_list,
+    run_results,
     max_threshold = DEFAULT_PRECISION_MAX_THRESHOLD,
-    score_threshold = DEFAULT_PRECISION_SCORE_THRESHOLD):
-    per_frame_distances = _compute_per_frame_ratios(center_distances_list)
-    thresholds = range(max_threshold + 1)
-    precisions = []
-
-    # Compute the precision for each threshold
-    for threshold in thresholds:
-        precision = float(len([d for d in per_frame_distances if d < threshold])) / len(per_frame_distances)
-        precisions.append(precision)
+    score_threshold = DEFAULT_PRECISION_SCORE_THRESHOLD,
+    thresholds = None):
+    per_frame_distances = _compute_per_frame_ratios([r.center_distances for r in run_results])
+    sorted_per_frame_distances = np.sort(per_frame_distances)
+    total_count = float(max(len(sorted_per_frame_distances), 1))
+    if thresholds is None:
+        thresholds = list(range(max_threshold + 1))
+
+    # Compute the precision for each threshold, which is the ratio of frames with lower distance
+    lower_counts = np.searchsorted(sorted_per_frame_distances, thresholds, side = 'left')
+    precisions = (lower_counts / total_count).tolist()
 
     # Get the precision score, which is the precision under score_threshold
-    precision_score = precisions[score_threshold]
+    precision_score = float(np.searchsorted(sorted_per_frame_distances, score_threshold, side = 'left')) / total_count
 
     return {
         'thresholds': thresholds,
@@ -88,28 +89,25 @@ def estimate_precision_plot(
         'max_threshold': max_threshold,
         'score_threshold': score_threshold,
         'per_frame_distances': per_frame_distances,
-        'center_distances_list': center_distances_list
+        'run_results': run_results
     }
 
-def estimate_accuracy(overlap_ratios_list):
-    per_frame_ratios = _compute_per_frame_ratios(overlap_ratios_list)
-    accuracy = mean(per_frame_ratios)
+def estimate_accuracy(run_results):
+    per_frame_ratios = _compute_per_frame_ratios([r.overlap_ratios for r in run_results])
+    accuracy = float(np.mean(per_frame_ratios)) if len(per_frame_ratios) > 0 else 0.0
 
     return {
         'accuracy': accuracy,
         'per_frame_ratios': per_frame_ratios,
-        'overlap_ratios_list': overlap_ratios_list
+        'run_results': run_results
     }
 
-def estimate_robustness(trajectory_list, sensitivity = DEFAULT_SENSITIVITY):
-    failures_rate_list = []
+def estimate_robustness(run_results, sensitivity = DEFAULT_SENSITIVITY):
     # XXX: We assume the list contains at least 1 sequence and all sequence have the same length
-    trajectory_len = len(trajectory_list[0])
+    trajectory_len = run_results[0].length()
 
     # Compute failures and failure rate for each sequence
-    for trajectory in trajectory_list:
-        failures = len([region for region in trajectory if isinstance(region, SpecialRegion) and (region.code == SpecialRegion.FAILURE)])
-        failures_rate_list.append(float(failures) / trajectory_len)
+    failures_rate_list = [float(r.count(SpecialRegion.FAILURE)) / trajectory_len for r in run_results]
 
     avg_failures_rate = mean(failures_rate_list)
     reliability = math.exp(-sensitivity * avg_failures_rate)
@@ -118,74 +116,134 @@ def estimate_robustness(trajectory_list, sensitivity = DEFAULT_SENSITIVITY):
         'reliability': reliability,
         'avg_failures_rate': avg_failures_rate,
         'sensitivity': sensitivity,
-        'trajectory_list': trajectory_list
+        'run_results': run_results
     }
 
-def estimate_ar_plot(overlap_ratios_list, trajectory_list):
-    accuracy = estimate_accuracy(overlap_ratios_list)
-    robustness = estimate_robustness(trajectory_list)
+def estimate_ar_plot(run_results):
+    accuracy = estimate_accuracy(run_results)
+    robustness = estimate_robustness(run_results)
 
     return merge_dict(accuracy, robustness)
 
+# Extract fragment(s) from a run, each fragment is the overlap ratios from an initialization
+# to a failure (status "failure") or to the end of the sequence (status "success")
+def _extract_fragments(run_result):
+    fragments = []
+    tracked = run_result.status == RunResult.TRACKED
+    events = np.flatnonzero((run_result.status == SpecialRegion.INIT) | (run_result.status == SpecialRegion.FAILURE))
+
+    fragment_start = 0
+    in_sequence = True
+    for idx in events.tolist():
+        if run_result.status[idx] == SpecialRegion.INIT:
+            fragment_start = idx + 1
+            in_sequence = True
+        else:
+            fragments.append((run_result.overlap_ratios[fragment_start : idx][tracked[fragment_start : idx]], True))
+            in_sequence = False
+    if in_sequence:
+        # The end is not failure, so status of this fragment is sucess
+        fragments.append((run_result.overlap_ratios[fragment_start:][tracked[fragment_start:]], False))
+
+    return fragments
+
+# Tabulate the fragments for computing EAO, the tables are indexed by Ns (the tables for the fragments
+# of different runs can be added up after padded with zeros to the same size):
+# - prefix_sums: Sum of prefixes of length Ns - 1 over fragments not shorter than Ns - 1
+# - failure_sums: Whole sums of failure fragments of length Ns - 1
+# - success_counts: Number of success fragments of length Ns - 1
+def _fragment_tables(fragments, fragments_length):
+    lengths = np.array([len(fragment) for fragment, is_failure in fragments], dtype = np.int64)
+    is_failures = np.array([is_failure for fragment, is_failure in fragments], dtype = bool)
+    bins = fragments_length + 1
+
+    prefix_sums = np.zeros(bins)
+    if len(fragments) > 0 and lengths.sum() > 0:
+        positions = np.concatenate([np.arange(1, length + 1) for length in lengths])
+        cumsums = np.concatenate([np.cumsum(fragment) for fragment, is_failure in fragments])
+        prefix_sums = np.bincount(positions, weights = cumsums, minlength = bins)[:bins]
+    whole_sums = np.array([np.sum(fragment) for fragment, is_failure in fragments if is_failure])
+    failure_sums = np.bincount(lengths[is_failures] + 1, weights = whole_sums, minlength = bins + 1)
+    success_counts = np.bincount(lengths[~is_failures] + 1, minlength = bins + 1)
+
+    return prefix_sums, failure_sums, success_counts
+
+# Calculate expected average overlap (EAO) for different Ns from the tables of fragments. For Ns > 1, the
+# average overlap of a fragment is the sum of its first (Ns - 1) overlap ratios divided by (Ns - 1). Fragments
+# shorter than (Ns - 1) that did not finish with failure are ignored, while the shorter ones that finished
+# with failure are padded with zeros.
+def _expected_average_overlaps(prefix_sums, failure_sums, success_counts, fragments_count, fragments_length):
+    bins = fragments_length + 1
+    # Whole sums of failure fragments shorter than Ns - 1
+    padded_sums = np.cumsum(failure_sums)[:bins]
+    # Number of usable fragments
+    usable_counts = fragments_count - np.cumsum(success_counts)[:bins]
+
+    # The index of the arrays above is Ns - 1
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        expected_average_overlaps = (prefix_sums + padded_sums) / np.maximum(np.arange(bins), 1) / usable_counts
+    # EAO for Ns = 1 is always 1.0
+    return ([1.0] + expected_average_overlaps[1 : fragments_length].tolist())[:fragments_length]
+
+# Calculate the EAO measure, which is the average EAO over the interval of typical sequence lengths
+def _eao_measure(expected_average_overlaps, sequence_lengths, threshold):
+    if len(sequence_lengths) <= 1:
+        return None
+    with stage('eao_interval', sequences = len(sequence_lengths)):
+        peak, low, high = estimate_eao_interval(sequence_lengths, threshold)
+    return mean(expected_average_overlaps[low - 1 : high])
+
 def estimate_eao(
-    videos_overlap_ratios_list,
-    videos_trajectory_list,
+    videos_run_results,
     sequence_lengths,
     threshold = DEFAULT_EAO_INTERVAL_THRESHOLD):
     fragments_length = 0
     fragments = []
-    expected_average_overlaps = []
-    eao_measure = None
 
-    for overlap_ratios_list, trajectory_list in zip(videos_overlap_ratios_list, videos_trajectory_list):
-        for overlap_ratios, trajectory in zip(overlap_ratios_list, trajectory_list):
+    for run_results in videos_run_results:
+        for run_result in run_results:
             # Update the fragments length if need
-            sequence_length = len(overlap_ratios)
-            fragments_length = sequence_length if sequence_length > fragments_length else fragments_length
+            fragments_length = max(fragments_length, run_result.length())
+            fragments.extend(_extract_fragments(run_result))
 
-            # Extract fragment(s) from the sequence
-            fragment = []
-            in_sequence = True
-            for overlap_ratio, region in zip(overlap_ratios, trajectory):
-                if not isinstance(region, SpecialRegion):
-                    fragment.append(overlap_ratio)
-                else:
-                    if region.code == SpecialRegion.INIT:
-                        fragment = []
-                        in_sequence = True
-                    elif region.code == SpecialRegion.FAILURE:
-                        fragments.append((fragment, 'failure'))
-                        in_sequence = False
-            if in_sequence:
-                # The end is not failure, so status of this fragment is sucess
-                fragments.append((fragment, 'success'))
-
-    # Calculate expected average overlap (EAO) for different Ns
-    for Ns in range(1, fragments_length + 1):
-        if Ns == 1:
-            # EAO for Ns = 1 is always 1.0
-            expected_average_overlaps.append(1.0)
-        else:
-            usable_count = 0
-            expected_average_overlap = 0.0
-            for fragment, status in fragments:
-                if status == 'success' and len(fragment) < Ns - 1:
-                    # Fragment shorter than Ns that did not finish with failure is ignored.
-                    continue
-                expected_average_overlap += float(sum(fragment[0 : Ns - 1])) / (Ns - 1)
-                usable_count += 1
-            expected_average_overlap /= usable_count
-            expected_average_overlaps.append(expected_average_overlap)
+    # The sums for all Ns are gathered in one pass with cumulative sums
+    prefix_sums, failure_sums, success_counts = _fragment_tables(fragments, fragments_length)
+    expected_average_overlaps = _expected_average_overlaps(prefix_sums, failure_sums, success_counts, len(fragments), fragments_length)
 
     # Calculate the EAO measure
-    if len(sequence_lengths) > 1:
-        peak, low, high = estimate_eao_interval(sequence_lengths, threshold)
-        eao_measure = mean(expected_average_overlaps[low - 1 : high])
+    eao_measure = _eao_measure(expected_average_overlaps, sequence_lengths, threshold)
 
     return {
         'expected_average_overlaps': expected_average_overlaps,
         'eao_measure': eao_measure,
-        'videos_overlap_ratios_list': videos_overlap_ratios_list,
-        'videos_trajectory_list': videos_trajectory_list,
+        'videos_run_results': videos_run_results,
         'sequence_lengths': sequence_lengths
     }
+
+# Get the times of initializations and estimations (including the failed ones), excluding frame decoding
+def _tracker_times(run_results):
+    status = np.concatenate([r.status for r in run_results])
+    times = np.concatenate([r.times for r in run_results])
+    init_times = times[(status == SpecialRegion.INIT) & ~np.isnan(times)]
+    estimate_times = times[((status == RunResult.TRACKED) | (status == SpecialRegion.FAILURE)) & ~np.isnan(times)]
+    return init_times, estimate_times
+
+def estimate_speed(run_results):
+    init_times, estimate_times = _tracker_times(run_results)
+
+    # Throughput (frames per second) of estimations, latencies and initialization cost are in milliseconds
+    total_time = float(np.sum(estimate_times))
+    fps = len(estimate_times) / total_time if total_time > 0 else float('nan')
+    latency_p50, latency_p95, latency_p99 = [float('nan')] * 3
+    if len(estimate_times) > 0:
+        latency_p50, latency_p95, latency_p99 = (np.percentile(estimate_times, [50, 95, 99]) * 1000.0).tolist()
+    init_time = float(np.mean(init_times)) * 1000.0 if len(init_times) > 0 else float('nan')
+
+    return {
+        'fps': fps,
+        'latency_p50': latency_p50,
+        'latency_p95': latency_p95,
+        'latency_p99': latency_p99,
+        'init_time': init_time,
+        'run_results': run_results
+    }
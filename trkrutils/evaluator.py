@@ -1,10 +1,17 @@
+import multiprocessing
+import numpy as np
+from timeit import default_timer as timer
 from trkrutils.consts import DEFAULT_ESTIMATED_COLOR, DEFAULT_GT_COLOR
-from trkrutils.core import Score, SpecialRegion
+from trkrutils.core import Score, SpecialRegion, RunResult, BatchTracker
+from trkrutils.profiler import stage, staged_iter
+from trkrutils.accumulator import DatasetAccumulator, compact_score
+from trkrutils.loader import CachedVideo, prefetch_frames, DEFAULT_FRAME_CACHE_SIZE, DEFAULT_PREFETCH_DEPTH
 from trkrutils.estimator import (
     estimate_success_plot,
     estimate_precision_plot,
     estimate_ar_plot,
-    estimate_eao
+    estimate_eao,
+    estimate_speed
 )
 
 DEFAULT_VISUALIZED = False
@@ -14,6 +21,12 @@ DEFAULT_STOCHASTIC = False
 DEFAULT_STOCHASTIC_REPETITIONS = 15
 DEFAULT_DETERMINISTIC_REPETITIONS = 1
 
+DEFAULT_WORKERS = 1
+DEFAULT_LOCKSTEP = False
+# Drop the raw per-frame data and run results of each video once it is accumulated, pass compact = False
+# to keep them in the video scores (e.g., to re-estimate metrics from the run results)
+DEFAULT_COMPACT = True
+
 DEFAULT_RESET = True
 DEFAULT_FAILURE_THRESHOLD = 0.0
 DEFAULT_REINITIALIZE_STEP = 5
@@ -22,12 +35,14 @@ METRICS = [
     'success_plot',
     'precision_plot',
     'ar_plot',
-    'eao'
+    'eao',
+    'speed'
 ]
 
 class _Experiment:
     # Init function
-    def __init__(self, settings = {}):
+    def __init__(self, name, settings = {}):
+        self.name = name
         self.settings = settings
         self.metrics = []
 
@@ -36,160 +51,366 @@ class _Experiment:
         if metric not in self.metrics:
             self.metrics.append(metric)
 
-def _reshape_list(scores, tracker_name, metric, value_name, repetitions):
-    reshaped_list = [[] for x in range(repetitions)]
-
-    for score in scores:
-        value_list = score.get_val(tracker_name, metric)[value_name]
-        for idx, value in enumerate(value_list):
-            reshaped_list[idx].extend(value)
-
-    return reshaped_list
+class _TrackerRun:
+    # The actions of a tracker on the next frame
+    INIT = 0
+    SKIP = 1
+    ESTIMATE = 2
 
-def _append_list(scores, tracker_name, metric, value_name):
-    appended_list = []
+    # Init function
+    def __init__(
+        self,
+        tracker,
+        video_length,
+        reset = DEFAULT_RESET,
+        failure_threshold = DEFAULT_FAILURE_THRESHOLD,
+        reinitialize_step = DEFAULT_REINITIALIZE_STEP,
+        key = None):
 
-    for score in scores:
-        value_list = score.get_val(tracker_name, metric)[value_name]
-        for idx, value in enumerate(value_list):
-            appended_list.append(value)
+        # Check the values of failure_threshold and reinitialize_step
+        if reset:
+            assert failure_threshold >= 0.0, 'Failure threshold must be >= 0.0, but get {}'.format(failure_threshold)
+            assert reinitialize_step >= 0, 'Reinitialize step must be >= 0, but get {}'.format(reinitialize_step)
 
-    return appended_list
+        self.tracker = tracker
+        self.key = key
+        self.video_length = video_length
+        self.reset = reset
+        self.failure_threshold = failure_threshold
+        self.reinitialize_step = reinitialize_step
+        self.is_init = False
+        self.rest_step = 0
+        self.next_idx = 0
+        self.run_result = RunResult(video_length)
 
-def _run_tracker(
-    tracker,
-    video,
-    reset = DEFAULT_RESET,
-    failure_threshold = DEFAULT_FAILURE_THRESHOLD,
-    reinitialize_step = DEFAULT_REINITIALIZE_STEP,
-    visualized = DEFAULT_VISUALIZED,
-    gt_color = DEFAULT_GT_COLOR,
-    estimated_color = DEFAULT_ESTIMATED_COLOR,
-    wait_preiod = DEFAULT_WAIT_PREIOD):
-
-    # Check the values of failure_threshold and reinitialize_step
-    if reset:
-        assert failure_threshold >= 0.0, 'Failure threshold must be >= 0.0, but get {}'.format(failure_threshold)
-        assert reinitialize_step >= 0, 'Reinitialize step must be >= 0, but get {}'.format(reinitialize_step)
+    # Get the action of the tracker on the next frame
+    def next_action(self):
+        if not self.is_init:
+            return _TrackerRun.INIT
+        elif self.reset and (self.rest_step > 0):
+            return _TrackerRun.SKIP
+        else:
+            return _TrackerRun.ESTIMATE
 
-    trajectory = []
-    overlap_ratios = []
-    center_distances = []
-    is_init = False
-    rest_step = 0
+    # Check if the tracker needs a frame (0-based index) which is not fed yet, the frames skipped after a failure are not needed
+    def needs_frame(self, idx):
+        return self.next_action() != _TrackerRun.SKIP or idx >= self.next_idx + self.rest_step
 
-    # Load the video frame by frame
-    frames = video.load_frames()
-    for idx, frame in enumerate(frames):
-        img = frame.get_img(with_gt = False)
-        gt = frame.get_gt()
-        overlap_ratio = float('nan')
-        center_distance = float('nan')
-
-        if not is_init:
-            # (Re-)Initialize with the frame and ground truth
-            tracker.init_frame(img, gt)
-            is_init = True
+    # Record the region of a frame after the action is taken by the tracker in the given time (in seconds)
+    # The overlap ratios and center distances are computed in bulk by finish, only the overlap ratio for failure detection
+    # is computed here
+    def update(self, idx, frame, action, estimated_region = None, time = float('nan')):
+        if action == _TrackerRun.INIT:
+            # The tracker is (re-)initialized with the frame and ground truth
+            self.is_init = True
             # Assign the region to be a special region for initialization
-            region = SpecialRegion(SpecialRegion.INIT)
-        elif reset and (rest_step > 0):
+            region = SpecialRegion.of(SpecialRegion.INIT)
+        elif action == _TrackerRun.SKIP:
             # It is after a failure, just skip the frame
-            rest_step -= 1
-            if rest_step == 0:
-                is_init = False
+            self.rest_step -= 1
+            if self.rest_step == 0:
+                self.is_init = False
             # Assign the region to be a undefined special region
-            region = SpecialRegion(SpecialRegion.UNDEFINED)
+            region = SpecialRegion.of(SpecialRegion.UNDEFINED)
         else:
-            estimated_region = tracker.estimate(img)
-            _overlap_ratio = gt.overlap_ratio(estimated_region)
-            if reset and (_overlap_ratio <= failure_threshold):
+            if self.reset and (frame.get_gt().overlap_ratio(estimated_region) <= self.failure_threshold):
                 # Failure detected
-                if reinitialize_step > 0:
+                if self.reinitialize_step > 0:
                     # Skip some frames after failure
-                    rest_step = reinitialize_step
+                    self.rest_step = self.reinitialize_step
                 else:
                     # If reinitialize_step is zero, skip all the rest frames
-                    rest_step = len(frames) - reinitialize_step - 1
+                    self.rest_step = self.video_length - self.reinitialize_step - 1
                 # Assign the region to be a special region for failure
-                region = SpecialRegion(SpecialRegion.FAILURE)
+                region = SpecialRegion.of(SpecialRegion.FAILURE)
             else:
                 # Assign the region to be the estimated region
                 region = estimated_region
-                overlap_ratio = _overlap_ratio
-                center_distance = gt.center_distance(estimated_region)
-                if visualized:
-                    gt.draw(img, gt_color)
-                    estimated_region.draw(img, estimated_color)
-                    video.show_img(img, wait_preiod)
 
-        trajectory.append(region)
-        overlap_ratios.append(overlap_ratio)
-        center_distances.append(center_distance)
+        self.run_result.set(idx, region, time = time)
+        self.next_idx = idx + 1
 
-    return trajectory, overlap_ratios, center_distances
+        return region
 
-def eval_video(
-    trackers,
+    # Compute the overlap ratios and center distances of all frames against the ground truth regions
+    # (see Video.load_gt_regions) once the run is finished
+    def finish(self, gt_regions):
+        self.run_result.rescore(gt_regions)
+        return self.run_result
+
+    # Feed a frame to the tracker and record the region of the frame
+    def step(self, idx, frame):
+        img = frame.get_img(with_gt = False)
+        action = self.next_action()
+        estimated_region = None
+        time = float('nan')
+        if action == _TrackerRun.INIT:
+            with stage('init_frame', tracker = self.tracker.__class__.__name__, key = self.key, frame = idx):
+                start = timer()
+                self.tracker.init_frame(img, frame.get_gt())
+                time = timer() - start
+        elif action == _TrackerRun.ESTIMATE:
+            with stage('estimate', tracker = self.tracker.__class__.__name__, key = self.key, frame = idx):
+                start = timer()
+                estimated_region = self.tracker.estimate(img)
+                time = timer() - start
+        return self.update(idx, frame, action, estimated_region, time)
+
+# Stack the ground truth regions (arrays) of frames into one array, the ground truth of frames
+# which are not loaded (None) is never used and filled with NaN
+def _stack_gt_regions(gt_regions):
+    width = max([len(gt_region) for gt_region in gt_regions if gt_region is not None] + [4])
+    gt_regions = [np.full(width, np.nan) if gt_region is None else gt_region for gt_region in gt_regions]
+    return np.array(gt_regions, dtype = np.float64).reshape((len(gt_regions), width))
+
+# Feed a frame to runs of the same batch tracker with one call per action,
+# the time of a call is shared equally by the runs in the call.
+# XXX: A batch only holds the runs (experiments and repetitions) of one video, all on the same frame.
+# Runs of different videos are not batched together, so the batch size is bounded by the number of
+# unfinished runs per video.
+def _step_batch(tracker, runs, idx, frame):
+    img = frame.get_img(with_gt = False)
+    actions = [run.next_action() for run in runs]
+    estimated_regions = [None] * len(runs)
+    times = [float('nan')] * len(runs)
+
+    init_idxs = [j for j, action in enumerate(actions) if action == _TrackerRun.INIT]
+    if len(init_idxs) > 0:
+        keys = [runs[j].key for j in init_idxs]
+        with stage('init_frame', tracker = tracker.__class__.__name__, key = keys, frame = idx):
+            start = timer()
+            tracker.init_frame_batch(keys, [img] * len(init_idxs), [frame.get_gt()] * len(init_idxs))
+            time = (timer() - start) / len(init_idxs)
+        for j in init_idxs:
+            times[j] = time
+    estimate_idxs = [j for j, action in enumerate(actions) if action == _TrackerRun.ESTIMATE]
+    if len(estimate_idxs) > 0:
+        keys = [runs[j].key for j in estimate_idxs]
+        with stage('estimate', tracker = tracker.__class__.__name__, key = keys, frame = idx):
+            start = timer()
+            regions = tracker.estimate_batch(keys, [img] * len(estimate_idxs))
+            time = (timer() - start) / len(estimate_idxs)
+        for j, region in zip(estimate_idxs, regions):
+            estimated_regions[j] = region
+            times[j] = time
+
+    return [run.update(idx, frame, action, region, time) for run, action, region, time in zip(runs, actions, estimated_regions, times)]
+
+# Run multiple trackers in lockstep, so each frame is loaded once and fed to all the trackers
+def _run_trackers(
+    runs,
     video,
-    metrics = METRICS,
-    stochastic = DEFAULT_STOCHASTIC,
     visualized = DEFAULT_VISUALIZED,
     gt_color = DEFAULT_GT_COLOR,
     estimated_color = DEFAULT_ESTIMATED_COLOR,
-    wait_preiod = DEFAULT_WAIT_PREIOD):
-    score = Score(video.name, 'video')
-    repetitions = DEFAULT_STOCHASTIC_REPETITIONS if stochastic else DEFAULT_DETERMINISTIC_REPETITIONS
+    wait_preiod = DEFAULT_WAIT_PREIOD,
+    prefetch = DEFAULT_PREFETCH_DEPTH):
+
+    # Runs of batch trackers are grouped by the tracker, so a tracker is called once per frame
+    batches = []
+    single_runs = []
+    for run in runs:
+        if isinstance(run.tracker, BatchTracker):
+            batch = [b for b in batches if b[0] is run.tracker]
+            if len(batch) > 0:
+                batch[0][1].append(run)
+            else:
+                batches.append((run.tracker, [run]))
+        else:
+            single_runs.append(run)
+
+    # A frame is decoded only if any tracker needs it
+    def needed(idx):
+        return any(run.needs_frame(idx) for run in runs)
+
+    # Load the video frame by frame, the next frames are decoded in background while tracking
+    video_length = video.length()
+    gt_regions = [None] * video_length
+    frames = staged_iter('load_frame', prefetch_frames(video, prefetch, needed = needed), video = video.name)
+    for idx, frame in enumerate(frames):
+        if frame is None:
+            # The frame is skipped by all trackers
+            regions = [run.update(idx, None, _TrackerRun.SKIP) for run in runs]
+        else:
+            gt_regions[idx] = frame.get_gt().to_array()
+            regions = [run.step(idx, frame) for run in single_runs]
+            for tracker, batch_runs in batches:
+                regions.extend(_step_batch(tracker, batch_runs, idx, frame))
+        if visualized:
+            for region in regions:
+                if not isinstance(region, SpecialRegion):
+                    img = frame.render([(frame.get_gt(), gt_color), (region, estimated_color)])
+                    video.show_img(img, wait_preiod)
+        # Stop once the rest frames are not needed by any tracker (e.g., after a failure when reinitialize_step
+        # is zero), the rest frames are left undefined in the results
+        if not needed(video_length - 1):
+            break
+    frames.close()
+
+    gt_regions = _stack_gt_regions(gt_regions)
+    return [run.finish(gt_regions) for run in runs]
+
+def _run_tracker(
+    tracker,
+    video,
+    reset = DEFAULT_RESET,
+    failure_threshold = DEFAULT_FAILURE_THRESHOLD,
+    reinitialize_step = DEFAULT_REINITIALIZE_STEP,
+    visualized = DEFAULT_VISUALIZED,
+    gt_color = DEFAULT_GT_COLOR,
+    estimated_color = DEFAULT_ESTIMATED_COLOR,
+    wait_preiod = DEFAULT_WAIT_PREIOD,
+    prefetch = DEFAULT_PREFETCH_DEPTH):
+    run = _TrackerRun(tracker, video.length(), reset, failure_threshold, reinitialize_step)
+    return _run_trackers([run], video, visualized, gt_color, estimated_color, wait_preiod, prefetch)[0]
+
+# Make the experiments needed by the metrics, experiments without any metric are dropped
+def _make_experiments(metrics):
     experiments = [
         # Experiment for success_plot
-        _Experiment(settings = {'reset': False}),
+        _Experiment('no_reset', settings = {'reset': False}),
         # Experiment for ar_plot
-        _Experiment(settings = {'reset': True}),
+        _Experiment('reset', settings = {
+            'reset': True,
+            'failure_threshold': DEFAULT_FAILURE_THRESHOLD,
+            'reinitialize_step': DEFAULT_REINITIALIZE_STEP
+        }),
     ]
 
     for metric in metrics:
-        if metric == 'success_plot' or metric == 'precision_plot':
+        if metric == 'success_plot' or metric == 'precision_plot' or metric == 'speed':
             experiments[0].insert_metric(metric)
         elif metric == 'ar_plot' or metric == 'eao':
             experiments[1].insert_metric(metric)
         else:
             raise ValueError('Metric "{}" is not supported'.format(metric))
+    return [experiment for experiment in experiments if len(experiment.metrics) > 0]
 
-    # Loop over all trackers
-    for tracker in trackers:
+# Get the results of each tracker and experiment, which are the stored results (if any) of finished runs or None
+def _load_results(video, trackers, experiments, repetitions, store):
+    results = dict()
+    for tracker_idx, tracker in enumerate(trackers):
         for experiment in experiments:
-            if len(experiment.metrics) > 0:
-                reset = experiment.settings['reset']
-                trajectory_list = []
-                overlap_ratios_list = []
-                center_distances_list = []
-                for i in range(repetitions):
-                    trajectory, overlap_ratios, center_distances = _run_tracker(
-                        tracker,
-                        video,
-                        reset = reset,
-                        visualized = visualized,
-                        gt_color = gt_color,
-                        estimated_color = estimated_color,
-                        wait_preiod = wait_preiod)
-                    trajectory_list.append(trajectory)
-                    overlap_ratios_list.append(overlap_ratios)
-                    center_distances_list.append(center_distances)
-
-            # Insert result
-            tracker_name = tracker.__class__.__name__
+            results[(tracker_idx, experiment.name)] = [
+                None if store is None else store.load(video, tracker, experiment.name, i, experiment.settings)
+                for i in range(repetitions)
+            ]
+    return results
+
+# Compute the metrics of a video from the results of each tracker and experiment, and insert them into the score
+def _insert_metrics(score, tracker_names, experiments, results, video_length):
+    for tracker_idx, tracker_name in enumerate(tracker_names):
+        for experiment in experiments:
+            run_results = results[(tracker_idx, experiment.name)]
             for metric in experiment.metrics:
-                if metric == 'success_plot':
-                    value = estimate_success_plot(overlap_ratios_list)
-                elif metric == 'precision_plot':
-                    value = estimate_precision_plot(center_distances_list)
-                elif metric == 'ar_plot':
-                    value = estimate_ar_plot(overlap_ratios_list, trajectory_list)
-                elif metric == 'eao':
-                    value = estimate_eao([overlap_ratios_list], [trajectory_list], [video.length()])
+                with stage('metric', video = score.target_name, tracker = tracker_name, metric = metric):
+                    if metric == 'success_plot':
+                        value = estimate_success_plot(run_results)
+                    elif metric == 'precision_plot':
+                        value = estimate_precision_plot(run_results)
+                    elif metric == 'ar_plot':
+                        value = estimate_ar_plot(run_results)
+                    elif metric == 'eao':
+                        value = estimate_eao([run_results], [video_length])
+                    elif metric == 'speed':
+                        value = estimate_speed(run_results)
                 score.insert(tracker_name, metric, value)
 
+def eval_video(
+    trackers,
+    video,
+    metrics = METRICS,
+    stochastic = DEFAULT_STOCHASTIC,
+    visualized = DEFAULT_VISUALIZED,
+    gt_color = DEFAULT_GT_COLOR,
+    estimated_color = DEFAULT_ESTIMATED_COLOR,
+    wait_preiod = DEFAULT_WAIT_PREIOD,
+    cache_size = DEFAULT_FRAME_CACHE_SIZE,
+    prefetch = DEFAULT_PREFETCH_DEPTH,
+    store = None,
+    lockstep = DEFAULT_LOCKSTEP):
+    score = Score(video.name, 'video')
+    repetitions = DEFAULT_STOCHASTIC_REPETITIONS if stochastic else DEFAULT_DETERMINISTIC_REPETITIONS
+    experiments = _make_experiments(metrics)
+
+    # Decode the video once and share the frames with all trackers, experiments and repetitions
+    video = CachedVideo(video, cache_size)
+    video_length = video.length()
+
+    # The results of each tracker and experiment, the stored results are reused if the runs are already finished
+    results = _load_results(video, trackers, experiments, repetitions, store)
+
+    # Group the unfinished runs into passes over the video. In lockstep mode, all trackers are fed
+    # in the same pass, otherwise each run has its own pass. The same tracker can not be in the same
+    # pass twice, since a tracker only follows one sequence at a time. The exception is a batch tracker,
+    # which follows all its experiments and repetitions in one pass.
+    passes = []
+    batch_pass = []
+    single_tracker_idxs = []
+    for tracker_idx, tracker in enumerate(trackers):
+        if isinstance(tracker, BatchTracker):
+            batch_pass.extend([(tracker_idx, experiment, i) for experiment in experiments for i in range(repetitions)])
+        else:
+            single_tracker_idxs.append(tracker_idx)
+    if lockstep:
+        for experiment in experiments:
+            for i in range(repetitions):
+                passes.append([(tracker_idx, experiment, i) for tracker_idx in single_tracker_idxs])
+    else:
+        for tracker_idx in single_tracker_idxs:
+            for experiment in experiments:
+                passes.extend([[(tracker_idx, experiment, i)] for i in range(repetitions)])
+    if lockstep and len(passes) > 0:
+        passes[0].extend(batch_pass)
+    else:
+        passes.append(batch_pass)
+
+    for runs_info in passes:
+        runs_info = [info for info in runs_info if results[(info[0], info[1].name)][info[2]] is None]
+        if len(runs_info) == 0:
+            continue
+        runs = [
+            _TrackerRun(trackers[tracker_idx], video_length, key = (experiment.name, i), **experiment.settings)
+            for tracker_idx, experiment, i in runs_info
+        ]
+        trackers_info = [(trackers[tracker_idx].__class__.__name__, experiment.name, i) for tracker_idx, experiment, i in runs_info]
+        with stage('run', video = video.name, trackers = trackers_info):
+            run_results = _run_trackers(runs, video, visualized, gt_color, estimated_color, wait_preiod, prefetch)
+        for (tracker_idx, experiment, i), run_result in zip(runs_info, run_results):
+            results[(tracker_idx, experiment.name)][i] = run_result
+            if store is not None:
+                store.save(video, trackers[tracker_idx], experiment.name, i, experiment.settings, run_result)
+
+    _insert_metrics(score, [tracker.__class__.__name__ for tracker in trackers], experiments, results, video_length)
+
     return [score]
 
+# The trackers of a worker process, which are created once by _init_worker
+_worker_trackers = None
+
+def _init_worker(tracker_factories):
+    global _worker_trackers
+    _worker_trackers = [tracker_factory() for tracker_factory in tracker_factories]
+
+def _eval_video_worker(args):
+    video, metrics, stochastic, cache_size, prefetch, store, lockstep = args
+    return eval_video(_worker_trackers, video, metrics, stochastic, cache_size = cache_size, prefetch = prefetch, store = store, lockstep = lockstep)
+
+# Evaluate videos in worker processes, the scores are yielded as soon as the videos are finished
+def _eval_videos_parallel(tracker_factories, videos, metrics, stochastic, cache_size, prefetch, store, lockstep, workers):
+    tasks = [(video, metrics, stochastic, cache_size, prefetch, store, lockstep) for video in videos]
+
+    pool = multiprocessing.Pool(workers, initializer = _init_worker, initargs = (tracker_factories,))
+    try:
+        for score in pool.imap(_eval_video_worker, tasks):
+            yield score
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
 def eval_dataset(
     trackers,
     dataset,
@@ -198,38 +419,41 @@ def eval_dataset(
     visualized = DEFAULT_VISUALIZED,
     gt_color = DEFAULT_GT_COLOR,
     estimated_color = DEFAULT_ESTIMATED_COLOR,
-    wait_preiod = DEFAULT_WAIT_PREIOD):
-    repetitions = DEFAULT_STOCHASTIC_REPETITIONS if stochastic else DEFAULT_DETERMINISTIC_REPETITIONS
+    wait_preiod = DEFAULT_WAIT_PREIOD,
+    cache_size = DEFAULT_FRAME_CACHE_SIZE,
+    prefetch = DEFAULT_PREFETCH_DEPTH,
+    store = None,
+    lockstep = DEFAULT_LOCKSTEP,
+    workers = DEFAULT_WORKERS,
+    callback = None,
+    compact = DEFAULT_COMPACT):
     scores = []
 
-    for video in dataset.get_videos():
-        score = eval_video(trackers, video, metrics, stochastic, visualized, gt_color, estimated_color, wait_preiod)
-        scores.extend(score)
+    if workers > 1:
+        # Trackers are usually not picklable, so each worker process creates its own
+        # trackers from the given factories (e.g. tracker classes)
+        assert not visualized, 'Visualization is not supported with multiple workers'
+        # The frame cache budget is shared by the workers, each of them evaluates a video at a time
+        videos_scores = _eval_videos_parallel(trackers, dataset.get_videos(), metrics, stochastic, cache_size // workers, prefetch, store, lockstep, workers)
+    else:
+        videos_scores = (
+            eval_video(trackers, video, metrics, stochastic, visualized, gt_color, estimated_color, wait_preiod, cache_size, prefetch, store, lockstep)
+            for video in dataset.get_videos()
+        )
 
-    overall_score = Score(dataset.name, 'dataset')
-    for metric in metrics:
-        for tracker in trackers:
-            tracker_name = tracker.__class__.__name__
-            if metric == 'success_plot':
-                overlap_ratios_list = _reshape_list(scores, tracker_name, metric, 'overlap_ratios_list', repetitions)
-                value = estimate_success_plot(overlap_ratios_list)
-            elif metric == 'precision_plot':
-                center_distances_list = _reshape_list(scores, tracker_name, metric, 'center_distances_list', repetitions)
-                value = estimate_precision_plot(center_distances_list)
-            elif metric == 'ar_plot':
-                overlap_ratios_list = _reshape_list(scores, tracker_name, metric, 'overlap_ratios_list', repetitions)
-                trajectory_list = _reshape_list(scores, tracker_name, metric, 'trajectory_list', repetitions)
-                value = estimate_ar_plot(overlap_ratios_list, trajectory_list)
-            elif metric == 'eao':
-                videos_overlap_ratios_list = _append_list(scores, tracker_name, metric, 'videos_overlap_ratios_list')
-                videos_trajectory_list = _append_list(scores, tracker_name, metric, 'videos_trajectory_list')
-                sequence_lengths = [score.get_val(tracker_name, metric)['sequence_lengths'][0] for score in scores]
-                value = estimate_eao(videos_overlap_ratios_list, videos_trajectory_list, sequence_lengths)
-            else:
-                raise ValueError('Metric "{}" is not supported'.format(metric))
-            overall_score.insert(tracker_name, metric, value)
+    # The dataset metrics are accumulated as each video is finished, instead of being computed from the results of all videos
+    accumulator = DatasetAccumulator(dataset.name)
+    for score in videos_scores:
+        for video_score in score:
+            accumulator.update(video_score)
+        # The partial score of the dataset is reported with the score of each finished video
+        if callback is not None:
+            callback(score[0], accumulator.get_score())
+        # In compact mode, only the summaries of the video are kept once it is accumulated,
+        # so the memory does not grow with the run results of all videos
+        scores.extend([compact_score(video_score) for video_score in score] if compact else score)
 
-    scores = [overall_score] + scores
+    scores = [accumulator.get_score()] + scores
 
     return scores
 
@@ -242,8 +466,15 @@ def eval(
     visualized = DEFAULT_VISUALIZED,
     gt_color = DEFAULT_GT_COLOR,
     estimated_color = DEFAULT_ESTIMATED_COLOR,
-    wait_preiod = DEFAULT_WAIT_PREIOD):
+    wait_preiod = DEFAULT_WAIT_PREIOD,
+    cache_size = DEFAULT_FRAME_CACHE_SIZE,
+    prefetch = DEFAULT_PREFETCH_DEPTH,
+    store = None,
+    lockstep = DEFAULT_LOCKSTEP,
+    workers = DEFAULT_WORKERS,
+    callback = None,
+    compact = DEFAULT_COMPACT):
     if video_name is not None:
-        return eval_video(trackers, dataset.get_video(video_name), metrics, stochastic, visualized, gt_color, estimated_color, wait_preiod)
+        return eval_video(trackers, dataset.get_video(video_name), metrics, stochastic, visualized, gt_color, estimated_color, wait_preiod, cache_size, prefetch, store, lockstep)
     else:
-        return eval_dataset(trackers, dataset, metrics, stochastic, visualized, gt_color, estimated_color, wait_preiod)
+        return eval_dataset(trackers, dataset, metrics, stochastic, visualized, gt_color, estimated_color, wait_preiod, cache_size, prefetch, store, lockstep, workers, callback, compact)
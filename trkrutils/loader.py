@@ -1,93 +1,441 @@
 import os
+import re
+import json
 import cv2
+import threading
+import zipfile
+import numpy as np
+from collections import deque
+from multiprocessing.pool import ThreadPool
 
-import downloader
-from trkrutils.core import Frame, Video, Dataset
+from trkrutils import downloader
+from trkrutils.core import Frame, Polygon, Video, Dataset
 from trkrutils.config import datasets as DATASETS
 from trkrutils.consts import DEFAULT_DOWNLOAD_VERBOSE
 
+# The memory budget (in bytes) of decoded frames shared by all runs on a video. When videos are
+# evaluated at the same time (by worker processes or concurrently), the budget is split among them.
+DEFAULT_FRAME_CACHE_SIZE = 512 * 1024 * 1024
+
+# The max number of frames decoded ahead of the consumer, and the number of decoding threads
+DEFAULT_PREFETCH_DEPTH = 8
+DEFAULT_PREFETCH_THREADS = 2
+
+# The settings of packed videos
+PACK_MAGIC = b'TRKRPACK'
+# The version of the format of packed files, which is bumped whenever the stored data changes its meaning
+PACK_VERSION = 1
+PACK_EXTENSION = '.pack'
+PACK_ALIGNMENT = 64
+DEFAULT_PACK_SCALE = 1.0
+DEFAULT_PACK_GRAYSCALE = False
+
+# Convert the ground truth bounding boxes (x, y, box_width, box_height) to an (N, 4) array of (x1, y1, x2, y2)
+def _otb_boxes(gt):
+    pos = np.trunc(np.asarray(gt, dtype = np.float64).reshape((-1, 4)))
+    return np.concatenate([pos[:, 0:2], pos[:, 0:2] + pos[:, 2:4]], axis = 1)
+
+# Convert the ground truth polygons (x1, y1, x2, y2, x3, y3, x4, y4), which are 1-based, to an (N, 8) array of 0-based polygons
+def _vot_polygons(gt):
+    return np.asarray(gt, dtype = np.float64).reshape((-1, 8)) - 1
+
+# Convert the ground truth polygons to an (N, 4) array of their bounding boxes (x1, y1, x2, y2)
+def _vot_boxes(gt):
+    pos = np.floor(_vot_polygons(gt).reshape((-1, 4, 2)))
+    return np.concatenate([pos.min(axis = 1), pos.max(axis = 1)], axis = 1)
+
+# Parse the lines of a ground truth text file into rows of floats, each row must have one of the given numbers of fields.
+# A malformed row is never skipped, since all the later frames would get the ground truth of wrong images.
+def _parse_gt_rows(video, name, separator, field_counts):
+    lines = video.read_lines(name)
+    # Only the blank lines at the end of file are allowed
+    while len(lines) > 0 and not lines[-1].strip():
+        lines.pop()
+
+    rows = []
+    for line_number, line in enumerate(lines, 1):
+        pos = re.split(separator, line.strip())
+        if len(pos) not in field_counts:
+            raise ValueError('Line {} of "{}" has {} fields, but expect {}'.format(
+                line_number, video.file_path(name), len(pos), ' or '.join(str(x) for x in field_counts)))
+        try:
+            rows.append([float(x) for x in pos])
+        except ValueError:
+            raise ValueError('Line {} of "{}" is not a list of numbers: {}'.format(line_number, video.file_path(name), line.strip()))
+    return rows
+
+# Make a frame with a ground truth bounding box: x, y, box_width, box_height
+def _make_otb_frame(img, gt):
+    return Frame(img, *[int(x) for x in _otb_boxes(gt)[0]])
+
+# Make a frame with a ground truth polygon: x1, y1, x2, y2, x3, y3, x4, y4
+def _make_vot_frame(img, gt):
+    return Frame(img, gt = Polygon(_vot_polygons(gt).reshape((4, 2))))
+
 class OTBVideo(Video):
+    # The name of the ground truth text file
+    GT_NAME = 'groundtruth_rect.txt'
+
     # Init function
     def __init__(self, dataset_name, name, path):
         Video.__init__(self, dataset_name, name, path)
 
-    # Load frames from disk
-    def load_frames(self):
-        frames = []
-
-        # Load the groundtruth file
-        gt_file = open(os.path.join(self.path, 'groundtruth_rect.txt')).readlines()
-
-        # Load images from folder and bounding boxes from the groudtruth file
-        spliter = ','
-        for idx, gt in enumerate(gt_file):
-            # Format of each bounding box one of following:
-            # x,y,box_width,box_height
-            # x\ty\tbox_width\tbox_height
-            pos = gt.split(spliter)
-            if len(pos) != 4:
-                spliter = '\t'
-                pos = gt.split(spliter)
-            pos = [int(x) for x in pos]
-            # Image is in the "img" folder and start from "0001.jpg"
-            img_path = os.path.join(self.path, 'img', '{:04d}.jpg'.format(idx + 1))
-            img = cv2.imread(img_path)
-            # Now add the new frame to the list
-            frames.append(Frame(img, pos[0], pos[1], pos[0] + pos[2], pos[1] + pos[3]))
-
-        return frames
-
-    # Get length (# of frames) of the video
-    def length(self):
-        return len([name for name in os.listdir(os.path.join(self.path, 'img')) if name.endswith('jpg')])
+    # Get the path of the ground truth text file
+    def groundtruth_path(self):
+        return os.path.join(self.path, OTBVideo.GT_NAME)
+
+    # Parse the ground truth text file into an (N, 4) float array
+    def parse_groundtruth(self):
+        # Format of each bounding box one of following:
+        # x,y,box_width,box_height
+        # x\ty\tbox_width\tbox_height
+        boxes = _parse_gt_rows(self, OTBVideo.GT_NAME, r'[,\t ]+', (4,))
+        return np.array(boxes, dtype = np.float64).reshape((-1, 4))
+
+    # Get the ground truth bounding boxes of all frames without loading frames
+    def load_gt_boxes(self):
+        return _otb_boxes(self.load_groundtruth())
+
+    # Load a specified frame (0-based index) from disk
+    def load_frame(self, idx):
+        # Image is in the "img" folder and start from "0001.jpg"
+        img = self.read_img('img/{:04d}.jpg'.format(idx + 1))
+        return _make_otb_frame(img, self.load_groundtruth()[idx])
 
 class VOTVideo(Video):
+    # The name of the ground truth text file
+    GT_NAME = 'groundtruth.txt'
+
     # Init function
     def __init__(self, dataset_name, name, path):
         Video.__init__(self, dataset_name, name, path)
 
-    # Load frames from disk
-    def load_frames(self):
-        frames = []
-
-        # Load the groundtruth file
-        gt_file = open(os.path.join(self.path, 'groundtruth.txt')).readlines()
-
-        # Load images from folder and bounding boxes from the groudtruth file
-        spliter = ','
-        for idx, gt in enumerate(gt_file):
-            # Format of bounding box:
-            # x1, y1, x2, y2, x3, y3, x4, y4
-            # TODO: Use rotated rectangle
-            pos = gt.split(spliter)
-            pos = [int(float(x)) for x in pos]
-            x1, y1 = pos[0], pos[1]
-            x2, y2 = pos[2], pos[3]
-            x3, y3 = pos[4], pos[5]
-            x4, y4 = pos[6], pos[7]
-            # Image is in the "img" folder and start from "00000001.jpg"
-            img_path = os.path.join(self.path, '{:08d}.jpg'.format(idx + 1))
-            img = cv2.imread(img_path)
-            # Now add the new frame to the list
-            frame = Frame(
-                img,
-                min(x1, x2, x3, x4) - 1,
-                min(y1, y2, y3, y4) - 1,
-                max(x1, x2, x3, x4) - 1,
-                max(y1, y2, y3, y4) - 1
-            )
-            frames.append(frame)
-
-        return frames
-
-    # Get length (# of frames) of the video
-    def length(self):
-        return len([name for name in os.listdir(self.path) if name.endswith('jpg')])
-
-def load(dataset_name, path = None, verbose = DEFAULT_DOWNLOAD_VERBOSE):
+    # Get the path of the ground truth text file
+    def groundtruth_path(self):
+        return os.path.join(self.path, VOTVideo.GT_NAME)
+
+    # Parse the ground truth text file into an (N, 8) float array
+    def parse_groundtruth(self):
+        polygons = []
+        # Format of bounding box one of following:
+        # x1,y1,x2,y2,x3,y3,x4,y4
+        # x,y,box_width,box_height
+        for pos in _parse_gt_rows(self, VOTVideo.GT_NAME, r'\s*,\s*', (4, 8)):
+            if len(pos) == 4:
+                # Convert the rectangle to a polygon in the same coordinates
+                x, y, box_width, box_height = pos
+                pos = [x, y, x + box_width, y, x + box_width, y + box_height, x, y + box_height]
+            polygons.append(pos)
+        return np.array(polygons, dtype = np.float64).reshape((-1, 8))
+
+    # Get the ground truth bounding boxes of all frames without loading frames
+    def load_gt_boxes(self):
+        return _vot_boxes(self.load_groundtruth())
+
+    # Get the ground truth polygons of all frames without loading frames
+    def load_gt_regions(self):
+        return _vot_polygons(self.load_groundtruth())
+
+    # Load a specified frame (0-based index) from disk
+    def load_frame(self, idx):
+        # Image is in the video folder and start from "00000001.jpg"
+        img = self.read_img('{:08d}.jpg'.format(idx + 1))
+        return _make_vot_frame(img, self.load_groundtruth()[idx])
+
+class ZipVideo:
+    # Init function, path is the zip file and prefix is the folder of the video in the zip file
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.archive = None
+        self.archive_lock = threading.Lock()
+
+    # The opened zip file and its lock are not picklable, they are re-created after unpickling
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['archive'] = None
+        del state['archive_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.archive_lock = threading.Lock()
+
+    # Get the path of a member of the video in the zip file
+    def file_path(self, name):
+        return os.path.join(self.path, self.prefix + name)
+
+    # Read a member of the video from the zip file
+    def read_bytes(self, name):
+        # Reading a zip file is not thread-safe, but decoding the bytes is
+        with self.archive_lock:
+            if self.archive is None:
+                self.archive = zipfile.ZipFile(self.path, 'r')
+            return self.archive.read(self.prefix + name)
+
+    # Read lines of a text file in the zip file
+    def read_lines(self, name):
+        return self.read_bytes(name).decode('utf-8').splitlines()
+
+    # Read and decode an image in the zip file
+    def read_img(self, name):
+        return cv2.imdecode(np.frombuffer(self.read_bytes(name), dtype = np.uint8), cv2.IMREAD_COLOR)
+
+    # The zip file may be shared read-only, so the ground truth index is only cached in memory
+    def groundtruth_path(self):
+        return None
+
+class ZipOTBVideo(ZipVideo, OTBVideo):
+    # Init function
+    def __init__(self, dataset_name, name, path, prefix):
+        OTBVideo.__init__(self, dataset_name, name, path)
+        ZipVideo.__init__(self, prefix)
+
+class ZipVOTVideo(ZipVideo, VOTVideo):
+    # Init function
+    def __init__(self, dataset_name, name, path, prefix):
+        VOTVideo.__init__(self, dataset_name, name, path)
+        ZipVideo.__init__(self, prefix)
+
+class PackedVideo(Video):
+    # Functions to make frames and bounding boxes for different formats of ground truth
+    FRAME_MAKERS = {
+        'otb': _make_otb_frame,
+        'vot': _make_vot_frame
+    }
+    BOX_MAKERS = {
+        'otb': _otb_boxes,
+        'vot': _vot_boxes
+    }
+    REGION_MAKERS = {
+        'otb': _otb_boxes,
+        'vot': _vot_polygons
+    }
+
+    # Init function, path is the packed file
+    def __init__(self, path):
+        self.buffer = None
+        self.index = _read_pack_index(path)
+        Video.__init__(self, self.index['dataset_name'], self.index['name'], path)
+
+    # The memory map is not picklable, it is re-opened after unpickling
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['buffer'] = None
+        return state
+
+    # Get the memory-mapped packed file, which is opened only once
+    def get_buffer(self):
+        if self.buffer is None:
+            self.buffer = np.memmap(self.path, dtype = np.uint8, mode = 'r')
+        return self.buffer
+
+    # The frames are downscaled and converted to grayscale as they were packed
+    def get_source(self):
+        return {'scale': self.index['scale'], 'grayscale': self.index['grayscale']}
+
+    # The ground truth index is stored in the packed file
+    def parse_groundtruth(self):
+        offset, shape = self.index['gt']
+        count = int(np.prod(shape))
+        return np.frombuffer(self.get_buffer(), dtype = np.float64, count = count, offset = offset).reshape(shape)
+
+    # Get the ground truth bounding boxes of all frames without loading frames
+    def load_gt_boxes(self):
+        return PackedVideo.BOX_MAKERS[self.index['format']](self.load_groundtruth())
+
+    # Get the ground truth regions of all frames without loading frames
+    def load_gt_regions(self):
+        return PackedVideo.REGION_MAKERS[self.index['format']](self.load_groundtruth())
+
+    # Load a specified frame (0-based index), the image is a zero-copy read-only view of the memory map
+    def load_frame(self, idx):
+        offset, shape = self.index['frames'][idx]
+        img = self.get_buffer()[offset : offset + int(np.prod(shape))].reshape(shape)
+        return PackedVideo.FRAME_MAKERS[self.index['format']](img, self.load_groundtruth()[idx])
+
+class CachedVideo(Video):
+    # Init function
+    def __init__(self, video, cache_size = DEFAULT_FRAME_CACHE_SIZE):
+        Video.__init__(self, video.dataset_name, video.name, video.path)
+        self.video = video
+        self.cache_size = cache_size
+        self.cache_usage = 0
+        self.frames = dict()
+        self.lock = threading.Lock()
+
+    # Get the source of the wrapped video
+    def get_source(self):
+        return self.video.get_source()
+
+    # Load the ground truth index from the wrapped video
+    def load_groundtruth(self):
+        return self.video.load_groundtruth()
+
+    # Get the ground truth bounding boxes from the wrapped video
+    def load_gt_boxes(self):
+        return self.video.load_gt_boxes()
+
+    # Get the ground truth regions from the wrapped video
+    def load_gt_regions(self):
+        return self.video.load_gt_regions()
+
+    # Load a specified frame, it is decoded only once as long as the cache has room for it
+    def load_frame(self, idx):
+        if idx in self.frames:
+            return self.frames[idx]
+
+        frame = self.video.load_frame(idx)
+        # XXX:
+        # A LRU policy thrashes on repeated sequential passes over a video longer than the cache,
+        # so we keep the frames cached first and re-decode the rest of them.
+        frame_size = 0 if frame.img is None else frame.img.nbytes
+        with self.lock:
+            # The frame may be decoded by other threads at the same time, it is counted only once
+            if idx in self.frames:
+                return self.frames[idx]
+            if self.cache_usage + frame_size <= self.cache_size:
+                self.frames[idx] = frame
+                self.cache_usage += frame_size
+
+        return frame
+
+    # Drop all cached frames
+    def clear(self):
+        with self.lock:
+            self.frames = dict()
+            self.cache_usage = 0
+
+# Read the index of a packed file, which is stored at the end of the file as:
+# index (JSON), length of index (uint64) and the magic bytes
+def _read_pack_index(path):
+    with open(path, 'rb') as f:
+        f.seek(-(8 + len(PACK_MAGIC)), os.SEEK_END)
+        trailer = f.read()
+        assert trailer[8:] == PACK_MAGIC, '"{}" is not a packed video'.format(path)
+        index_length = int(np.frombuffer(trailer[:8], dtype = '<u8')[0])
+        f.seek(-(8 + len(PACK_MAGIC) + index_length), os.SEEK_END)
+        index = json.loads(f.read(index_length).decode('utf-8'))
+    assert index.get('version') == PACK_VERSION, \
+        'Packed video "{}" has format version {}, but expect {}, please pack it again'.format(path, index.get('version'), PACK_VERSION)
+    return index
+
+# Write an array to a file at an aligned offset, and return the offset
+def _write_aligned(f, array):
+    padding = (-f.tell()) % PACK_ALIGNMENT
+    f.write(b'\0' * padding)
+    offset = f.tell()
+    f.write(np.ascontiguousarray(array).tobytes())
+    return offset
+
+# Pack decoded frames and ground truth of a video into a single file for memory mapping.
+# Frames can be downscaled (the ground truth is scaled as well) and converted to grayscale.
+def pack_video(video, path, scale = DEFAULT_PACK_SCALE, grayscale = DEFAULT_PACK_GRAYSCALE):
+    gt = np.array(video.load_groundtruth(), dtype = np.float64)
+    index = {
+        'version': PACK_VERSION,
+        'dataset_name': video.dataset_name,
+        'name': video.name,
+        'format': 'otb' if gt.shape[1] == 4 else 'vot',
+        'scale': scale,
+        'grayscale': grayscale,
+        'frames': []
+    }
+    if index['format'] == 'vot':
+        # The VOT ground truth is 1-based, so it is scaled in 0-based coordinates and stored 1-based as before
+        gt = (gt - 1) * scale + 1
+    else:
+        gt = gt * scale
+
+    # Write to a temporary file first, so a partial file is never loaded
+    tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+    with open(tmp_path, 'wb') as f:
+        index['gt'] = (_write_aligned(f, gt), gt.shape)
+        for frame in video.iter_frames():
+            img = frame.get_img(with_gt = False)
+            if scale != 1.0:
+                img = cv2.resize(img, None, fx = scale, fy = scale, interpolation = cv2.INTER_AREA)
+            if grayscale and img.ndim == 3:
+                img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+            index['frames'].append((_write_aligned(f, img), img.shape))
+        index_bytes = json.dumps(index).encode('utf-8')
+        f.write(index_bytes)
+        f.write(np.array([len(index_bytes)], dtype = '<u8').tobytes())
+        f.write(PACK_MAGIC)
+    os.rename(tmp_path, path)
+
+# Pack all videos of a dataset into a folder, one file per video
+def pack_dataset(dataset, path, scale = DEFAULT_PACK_SCALE, grayscale = DEFAULT_PACK_GRAYSCALE):
+    if not os.path.isdir(path):
+        os.makedirs(path)
+    for video in dataset.get_videos():
+        pack_video(video, os.path.join(path, '{}{}'.format(video.name, PACK_EXTENSION)), scale, grayscale)
+
+# Load a dataset packed by pack_dataset
+def load_packed(dataset_name, path):
+    videos = [PackedVideo(os.path.join(path, filename)) for filename in sorted(os.listdir(path)) if filename.endswith(PACK_EXTENSION)]
+    return Dataset(dataset_name, path, videos)
+
+# Iterate over frames of a video while decoding the next frames in background threads.
+# OpenCV releases the GIL while decoding, so decoding overlaps with the consumer of frames.
+# If needed is given, a frame is decoded only if needed(idx) is true when it is scheduled,
+# otherwise None is yielded in place of the frame.
+def prefetch_frames(video, depth = DEFAULT_PREFETCH_DEPTH, threads = DEFAULT_PREFETCH_THREADS, needed = None):
+    video_length = video.length()
+
+    if depth <= 0:
+        for idx in range(video_length):
+            yield video.load_frame(idx) if needed is None or needed(idx) else None
+        return
+
+    next_idx = 0
+    pending = deque()
+    pool = ThreadPool(max(1, threads))
+    try:
+        # Keep at most "depth" frames decoded or being decoded ahead of the consumer
+        while pending or next_idx < video_length:
+            while next_idx < video_length and len(pending) < depth:
+                if needed is None or needed(next_idx):
+                    pending.append(pool.apply_async(video.load_frame, (next_idx,)))
+                else:
+                    pending.append(None)
+                next_idx += 1
+            result = pending.popleft()
+            yield None if result is None else result.get()
+    finally:
+        pool.terminate()
+
+# Find videos in the zip files of a dataset, each video is a folder with a ground truth file
+def _find_zipped_videos(dataset_path, gt_name):
+    videos_info = []
+
+    for filename in sorted(os.listdir(dataset_path)):
+        zip_path = os.path.join(dataset_path, filename)
+        if not (filename.endswith('.zip') and zipfile.is_zipfile(zip_path)):
+            continue
+        with zipfile.ZipFile(zip_path, 'r') as archive:
+            for member in archive.namelist():
+                if member.split('/')[-1] == gt_name:
+                    prefix = member[:-len(gt_name)]
+                    video_name = prefix.rstrip('/').split('/')[-1]
+                    if video_name:
+                        videos_info.append((video_name, zip_path, prefix))
+
+    return videos_info
+
+def load(dataset_name, path = None, verbose = DEFAULT_DOWNLOAD_VERBOSE, extract = True):
     assert dataset_name in DATASETS.keys(), 'Dataset "{}" is not supported'.format(dataset_name)
 
-    dataset_path = downloader.download(dataset_name, verbose = verbose) if path is None else path
+    dataset_path = downloader.download(dataset_name, verbose = verbose, extract = extract) if path is None else path
+
+    if not extract:
+        # Serve frames and ground truth straight from the zip files
+        if dataset_name.startswith('otb'):
+            video_class, gt_name = ZipOTBVideo, OTBVideo.GT_NAME
+        else:
+            video_class, gt_name = ZipVOTVideo, VOTVideo.GT_NAME
+        videos_info = _find_zipped_videos(dataset_path, gt_name)
+        videos = [video_class(dataset_name, info[0], info[1], info[2]) for info in videos_info]
+        return Dataset(dataset_name, dataset_path, videos)
 
     video_class = Video
     videos_info = []
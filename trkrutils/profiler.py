@@ -0,0 +1,155 @@
+import cProfile
+import os
+import threading
+from timeit import default_timer as timer
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+# The registered hooks, stages are not tracked at all when it is empty
+_hooks = []
+
+class Hook:
+    # Called when a stage starts, context is a dict of the video, tracker, repetition, etc.
+    def on_stage_start(self, name, context):
+        pass
+
+    # Called when a stage ends
+    def on_stage_end(self, name, context):
+        pass
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+class _Stage:
+    # Init function
+    def __init__(self, name, context):
+        self.name = name
+        self.context = context
+
+    def __enter__(self):
+        for hook in _hooks:
+            hook.on_stage_start(self.name, self.context)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        for hook in reversed(_hooks):
+            hook.on_stage_end(self.name, self.context)
+        return False
+
+_NULL_STAGE = _NullStage()
+
+# Get a context manager wrapping a stage, it is a shared no-op if there is no hook
+def stage(name, **context):
+    if not _hooks:
+        return _NULL_STAGE
+    return _Stage(name, context)
+
+def add_hook(hook):
+    if hook not in _hooks:
+        _hooks.append(hook)
+
+def remove_hook(hook):
+    if hook in _hooks:
+        _hooks.remove(hook)
+
+# Register a hook only within a with-block
+class hooked:
+    # Init function
+    def __init__(self, hook):
+        self.hook = hook
+
+    def __enter__(self):
+        add_hook(self.hook)
+        return self.hook
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        remove_hook(self.hook)
+        return False
+
+class StageProfiler(Hook):
+    # Init function. If memory is True, the net memory allocated in each stage is traced by tracemalloc.
+    # The stages in cprofile_stages are profiled by cProfile, and their stats are dumped to dump_path (if any).
+    def __init__(self, memory = False, cprofile_stages = None, dump_path = None):
+        self.memory = memory and tracemalloc is not None
+        self.cprofile_stages = set(cprofile_stages or [])
+        self.dump_path = dump_path
+        self.stats = dict()
+        self.profiles = dict()
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    # Get the stack of started stages of the current thread
+    def get_stack(self):
+        if not hasattr(self.local, 'stack'):
+            self.local.stack = []
+        return self.local.stack
+
+    def on_stage_start(self, name, context):
+        memory = tracemalloc.get_traced_memory()[0] if self.memory else 0
+        profile = None
+        # Only one cProfile profiler can be active at a time, so nested stages are not profiled
+        if name in self.cprofile_stages and not any(s[2] is not None for s in self.get_stack()):
+            profile = self.profiles.setdefault(name, cProfile.Profile())
+            profile.enable()
+        self.get_stack().append((name, timer(), profile, memory))
+
+    def on_stage_end(self, name, context):
+        _name, start, profile, memory = self.get_stack().pop()
+        end = timer()
+        if profile is not None:
+            profile.disable()
+        memory = tracemalloc.get_traced_memory()[0] - memory if self.memory else 0
+
+        with self.lock:
+            stat = self.stats.setdefault(name, {'count': 0, 'time': 0.0, 'memory': 0, 'max_memory': 0})
+            stat['count'] += 1
+            stat['time'] += end - start
+            stat['memory'] += memory
+            stat['max_memory'] = max(stat['max_memory'], memory)
+
+    # Get a breakdown of each stage: count, total time (in seconds),
+    # total and max net memory (in bytes) allocated in the stage
+    def summary(self):
+        with self.lock:
+            return dict((name, dict(stat)) for name, stat in self.stats.items())
+
+    # Dump cProfile stats of the profiled stages, one file per stage
+    def dump(self):
+        if self.dump_path is None:
+            return
+        if not os.path.isdir(self.dump_path):
+            os.makedirs(self.dump_path)
+        for name, profile in self.profiles.items():
+            profile.dump_stats(os.path.join(self.dump_path, '{}.prof'.format(name)))
+
+    # Format the breakdown as a text table, sorted by total time
+    def format(self):
+        lines = ['{:<16}{:>10}{:>14}{:>16}'.format('Stage', 'Count', 'Time(s)', 'Memory(KiB)')]
+        for name, stat in sorted(self.summary().items(), key = lambda item: -item[1]['time']):
+            lines.append('{:<16}{:>10}{:>14.4f}{:>16.1f}'.format(name, stat['count'], stat['time'], stat['memory'] / 1024.0))
+        return '\n'.join(lines)
+
+def _staged_iter(name, iterable, context):
+    iterator = iter(iterable)
+    while True:
+        with stage(name, **context):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+# Wrap each step of an iteration (e.g. loading frames) in a stage, the iterable is returned as is if there is no hook
+def staged_iter(name, iterable, **context):
+    if not _hooks:
+        return iterable
+    return _staged_iter(name, iterable, context)
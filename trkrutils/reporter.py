@@ -1,6 +1,7 @@
 import matplotlib.pyplot as plt, mpld3
 import pandas as pd
 from trkrutils import webapp
+from trkrutils.profiler import stage
 
 DEFAULT_SHOW = True
 DEFAULT_SAVE = False
@@ -10,7 +11,12 @@ DEFAULT_TABLE_ORDER = [
     'ACC',
     'ROB',
     'AUC',
-    'PREC'
+    'PREC',
+    'FPS',
+    'P50(ms)',
+    'P95(ms)',
+    'P99(ms)',
+    'INIT(ms)'
 ]
 
 # Generate a table for given value name from a result
@@ -19,7 +25,7 @@ def _gen_table(result, value_name, shown_name):
     tracker_values = []
 
     # Find the corresponding value for each tracker
-    for tracker_name, values in result.iteritems():
+    for tracker_name, values in result.items():
         tracker_names.append(tracker_name)
         tracker_values.append(values[value_name])
 
@@ -41,7 +47,7 @@ def _ar_plot(score):
     table = pd.concat([acc_table, rob_table], axis = 1)
     # The sensitivity
     # XXX: We assume at least one tracker is measured and all trackers are measured under the same sensitivity
-    sensitivity = result.values()[0]['sensitivity']
+    sensitivity = next(iter(result.values()))['sensitivity']
 
     # Create a new plot figure
     fig = plt.figure()
@@ -54,7 +60,7 @@ def _ar_plot(score):
     plt.grid()
 
     # Fill the score for each tracker
-    for tracker_name, values in result.iteritems():
+    for tracker_name, values in result.items():
         plt.scatter(x = values['reliability'], y = values['accuracy'], label = '{}'.format(tracker_name))
 
     # TODO:
@@ -77,7 +83,7 @@ def _eao(score):
     table = _gen_table(result, 'eao_measure', 'EAO')
     # The max sequence length
     # XXX: We assume at least one tracker is measured and all trackers are measured under the same lengths
-    fragments_length = len(result.values()[0]['expected_average_overlaps'])
+    fragments_length = len(next(iter(result.values()))['expected_average_overlaps'])
 
     # Create a new plot figure
     fig = plt.figure()
@@ -90,7 +96,7 @@ def _eao(score):
     plt.grid()
 
     # Fill the score for each tracker
-    for tracker_name, values in result.iteritems():
+    for tracker_name, values in result.items():
         plt.plot(range(1, fragments_length + 1), values['expected_average_overlaps'], label = '{}'.format(tracker_name))
 
     plt.legend()
@@ -119,7 +125,7 @@ def _success_plot(score):
     plt.grid()
 
     # Fill the score for each tracker
-    for tracker_name, values in result.iteritems():
+    for tracker_name, values in result.items():
         plt.plot(values['thresholds'], values['success_rates'], label = '{} [ {:.3f} ]'.format(tracker_name, values['auc']))
         plt.legend()
 
@@ -138,7 +144,7 @@ def _precision_plot(score):
     # Get the maximum threshold
     # XXX:
     # We assume at least one tracker result is in the score and all trackers are evaluated under same max threshold
-    max_threshold = result.itervalues().next()['max_threshold']
+    max_threshold = next(iter(result.values()))['max_threshold']
 
     # Create a new plot figure
     fig = plt.figure()
@@ -151,7 +157,7 @@ def _precision_plot(score):
     plt.grid()
 
     # Fill the score for each tracker
-    for tracker_name, values in result.iteritems():
+    for tracker_name, values in result.items():
         plt.plot(values['thresholds'], values['precisions'], label = '{} [ {:.3f} ]'.format(tracker_name, values['precision_score']))
 
     # Paint the legend
@@ -159,6 +165,40 @@ def _precision_plot(score):
 
     return fig, table, filename
 
+# Speed (throughput and latency) of trackers
+def _speed(score):
+    # Get the target target (video or dataset) name
+    target_name = score.target_name
+    # The filename for saving
+    filename = 'Speed-{}.png'.format(target_name)
+    # The data for painting
+    result = score.results['speed']
+    # Generate the table for this metric
+    table = pd.concat([
+        _gen_table(result, 'fps', 'FPS'),
+        _gen_table(result, 'latency_p50', 'P50(ms)'),
+        _gen_table(result, 'latency_p95', 'P95(ms)'),
+        _gen_table(result, 'latency_p99', 'P99(ms)'),
+        _gen_table(result, 'init_time', 'INIT(ms)')
+    ], axis = 1)
+
+    # Create a new plot figure
+    fig = plt.figure()
+
+    # Fill the fixed text
+    plt.ylabel('Frames per second')
+    plt.title('Speed of {}'.format(target_name))
+    plt.grid()
+
+    # Fill the score for each tracker
+    for idx, (tracker_name, values) in enumerate(result.items()):
+        plt.bar(idx, values['fps'], label = '{} [ {:.1f} ]'.format(tracker_name, values['fps']))
+
+    # Paint the legend
+    plt.legend()
+
+    return fig, table, filename
+
 def report(scores, show = DEFAULT_SHOW, save = DEFAULT_SAVE):
     data_list = []
 
@@ -167,28 +207,31 @@ def report(scores, show = DEFAULT_SHOW, save = DEFAULT_SAVE):
         table = pd.DataFrame()
 
         for metric_name in score.get_metrics():
-            if metric_name == 'success_plot':
-                fig, _table, filename = _success_plot(score)
-            elif metric_name == 'precision_plot':
-                fig, _table, filename = _precision_plot(score)
-            elif metric_name == 'ar_plot':
-                fig, _table, filename = _ar_plot(score)
-            elif metric_name == 'eao':
-                fig, _table, filename = _eao(score)
-            else:
-                raise ValueError('Metric "{}" is not supported'.format(metric))
-
-            # Save the plot as an image
-            if save:
-                plt.savefig(filename)
-
-            # Append the plot and table for showing
-            if show:
-                html_plots.append(mpld3.fig_to_html(fig))
-                table = pd.concat([table, _table], axis = 1)
-
-            # Close the plot figure
-            plt.close(fig)
+            with stage('report', target = score.target_name, metric = metric_name):
+                if metric_name == 'success_plot':
+                    fig, _table, filename = _success_plot(score)
+                elif metric_name == 'precision_plot':
+                    fig, _table, filename = _precision_plot(score)
+                elif metric_name == 'ar_plot':
+                    fig, _table, filename = _ar_plot(score)
+                elif metric_name == 'eao':
+                    fig, _table, filename = _eao(score)
+                elif metric_name == 'speed':
+                    fig, _table, filename = _speed(score)
+                else:
+                    raise ValueError('Metric "{}" is not supported'.format(metric))
+
+                # Save the plot as an image
+                if save:
+                    plt.savefig(filename)
+
+                # Append the plot and table for showing
+                if show:
+                    html_plots.append(mpld3.fig_to_html(fig))
+                    table = pd.concat([table, _table], axis = 1)
+
+                # Close the plot figure
+                plt.close(fig)
 
         if show:
             # Reorder the table
@@ -0,0 +1,114 @@
+import hashlib
+import os
+import sys
+import numpy as np
+from trkrutils.core import RunResult
+from trkrutils.consts import DEFAULT_RESULTS_PATH
+
+# The version of scoring (overlap ratios, center distances and failure detection) of stored results,
+# it is bumped whenever the scoring changes, so results scored differently are never mixed.
+# Version 2 scores the VOT ground truth as polygons instead of axis-aligned boxes.
+SCORING_VERSION = 2
+
+# The hashes of the source files of tracker classes, a source file is hashed only once per process
+_source_hashes = dict()
+
+# Get the module name of a tracker class, the main script is named "__mp_main__" in the worker processes
+def _module_name(tracker):
+    module_name = tracker.__class__.__module__
+    return '__main__' if module_name == '__mp_main__' else module_name
+
+# Get the hash of the content of the source file of a tracker class, None if it is not defined in a file
+def _source_hash(tracker):
+    module = sys.modules.get(tracker.__class__.__module__)
+    filename = getattr(module, '__file__', None)
+    if filename is None:
+        return None
+    # Use the source file instead of the compiled one if it exists
+    if filename.endswith(('.pyc', '.pyo')) and os.path.exists(filename[:-1]):
+        filename = filename[:-1]
+    filename = os.path.abspath(filename)
+    if filename not in _source_hashes:
+        if not os.path.exists(filename):
+            return None
+        with open(filename, 'rb') as f:
+            _source_hashes[filename] = hashlib.sha1(f.read()).hexdigest()
+    return _source_hashes[filename]
+
+# Compute a hash identifying a tracker and its configuration under given evaluation settings and scoring,
+# on a given source of the video (see core.Video.get_source). The results of a changed tracker are not
+# reused: a tracker is identified by its version if it is set, otherwise by the content of its source file.
+# The changes of its model weights are only noticed through get_config.
+def _config_hash(tracker, settings, source = None):
+    config = tracker.get_config() if hasattr(tracker, 'get_config') else dict()
+    version = getattr(tracker, 'version', None)
+    identity = repr((
+        SCORING_VERSION,
+        _module_name(tracker),
+        tracker.__class__.__name__,
+        version if version is not None else _source_hash(tracker),
+        sorted(config.items()),
+        sorted(settings.items()),
+        sorted((source or dict()).items())
+    ))
+    return hashlib.sha1(identity.encode('utf-8')).hexdigest()[:16]
+
+class ResultStore:
+    # Init function
+    def __init__(self, path = DEFAULT_RESULTS_PATH):
+        self.path = path
+
+    # Get the file path of a run, one compressed file is stored per run
+    def get_path(self, video, tracker, experiment_name, repetition, settings):
+        return os.path.join(
+            self.path,
+            video.dataset_name,
+            video.name,
+            tracker.__class__.__name__,
+            _config_hash(tracker, settings, video.get_source()),
+            '{}-{:03d}.npz'.format(experiment_name, repetition))
+
+    # Load the result of a run, return None if the run is not finished yet
+    def load(self, video, tracker, experiment_name, repetition, settings):
+        path = self.get_path(video, tracker, experiment_name, repetition, settings)
+        if not os.path.exists(path):
+            return None
+
+        with np.load(path) as data:
+            run_result = RunResult()
+            run_result.boxes = data['boxes']
+            run_result.overlap_ratios = data['overlap_ratios']
+            run_result.center_distances = data['center_distances']
+            run_result.status = data['status']
+            # Results stored before timing was recorded have no times
+            run_result.times = data['times'] if 'times' in data else np.full(run_result.length(), np.nan)
+
+        # A stale result of a video with different length is never reused
+        if run_result.length() != video.length():
+            return None
+
+        return run_result
+
+    # Save the result of a finished run
+    def save(self, video, tracker, experiment_name, repetition, settings, run_result):
+        path = self.get_path(video, tracker, experiment_name, repetition, settings)
+        dir_path = os.path.dirname(path)
+        if not os.path.isdir(dir_path):
+            try:
+                os.makedirs(dir_path)
+            except OSError:
+                # The folder may be created by another worker at the same time
+                if not os.path.isdir(dir_path):
+                    raise
+
+        # Write to a temporary file first, so an interrupted write is never loaded
+        tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(
+                f,
+                boxes = run_result.boxes,
+                overlap_ratios = run_result.overlap_ratios,
+                center_distances = run_result.center_distances,
+                status = run_result.status,
+                times = run_result.times)
+        os.rename(tmp_path, path)